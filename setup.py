@@ -11,7 +11,7 @@ setup(name='TCFnetworks',
       author_email='frederik.elwert@web.de',
       url='https://github.com/SeNeReKo/TCFnetworks',
       packages=['tcfnetworks', 'tcfnetworks.annotators',
-                'tcfnetworks.exporters'],
+                'tcfnetworks.exporters', 'tcfnetworks.benchmarks'],
       package_data={'tcfnetworks.exporters': ['data/tcf2graphml.xsl',
                                               'data/d3.v3.min.js',
                                               'data/d3.html']},
@@ -29,28 +29,116 @@ import os
 import logging
 from types import MethodType
 
+from tcflib import tcf
 from tcflib.service import AddingWorker
 from tcflib.tagsets import TagSet
 
+try:
+    from tcfnetworks.backbone import METHODS as BACKBONE_METHODS
+    from tcfnetworks.backbone import extract_backbone
+except ImportError:
+    BACKBONE_METHODS = None
+from tcfnetworks.cache import (ResultCache, UNCACHED_OPTIONS, hash_layers,
+                               cached_options, corpus_element)
+from tcfnetworks.corpus import LazyTextCorpus
+from tcfnetworks.metrics import InstrumentedWorker
+from tcfnetworks.resolution import (ResolutionIndex, ENTITY_CLASSES,
+                                    parse_class_map)
+from tcfnetworks.utils import encode_token_runs
+from tcfnetworks.workers import parse_options
+
 ISOcat = TagSet('DC-1345')
 PUNCT = ISOcat['punctuation']
 VERB = ISOcat['verb']
 ADVERB = ISOcat['adverb']
 
 
-class TokenTestingWorker(AddingWorker):
+def add_graph_layer(corpus, graph_elem, config=None):
+    """
+    Add a serialized graph to `corpus` as an additional graph layer.
+
+    :meth:`tcflib.tcf.TextCorpus.add_layer` only supports a single layer of
+    each type, which is serialized when the corpus is. Serialized graphs
+    can be extended, and several graph layers can be added. They are told
+    apart by their `config` attribute.
+
+    :parameters:
+        - `corpus`: A :class:`tcflib.tcf.TextCorpus`.
+        - `graph_elem`: A `graph` element.
+        - `config`: The label of the graph layer, if any.
+
+    """
+    if config is not None:
+        graph_elem.set('config', config)
+    corpus_element(corpus.tree).append(graph_elem)
+
 
-    __options__ = {
+class TokenTestingWorker(InstrumentedWorker, AddingWorker):
+
+    __options__ = InstrumentedWorker.__options__.copy()
+    __options__.update({
         'nodes': 'lexical',
         'label': 'semantic_unit',
         'stopwords': [''],
         'stopwords_preset': '',
         'stopwords_feature': 'text',
         'postag': [''],
-    }
+        # Mappings of entity classes to canonical classes, as `RAW:CANON`.
+        'entity_classes': ['{}:{}'.format(raw, canonical) for raw, canonical
+                           in ENTITY_CLASSES.items()],
+        'actors': ['PER', 'ORG'],  # canonical entity classes of actors
+        'cache': '',  # directory of the result cache
+        'cache_size': 512,  # in MiB
+        'sweep': [''],  # configurations like `window=2,weight=pmi`
+        'backbone': [''],  # 'disparity', 'noise_corrected', 'kcore', 'topk'
+        'backbone_alpha': 0.05,
+        'backbone_k': 2,
+        'token_encoding': 'ids',  # 'ids', 'runs' or 'count'
+    })
+
+    #: Options that influence which tokens pass the token test.
+    filter_options = ('nodes', 'stopwords', 'stopwords_preset',
+                      'stopwords_feature', 'postag', 'entity_classes',
+                      'actors')
+    #: Options that do not influence the result and are not part of cache
+    #: keys.
+    uncached_options = UNCACHED_OPTIONS
+    #: Options that are the same for all configurations of a sweep.
+    shared_options = ('sweep', 'cache', 'cache_size', 'metrics', 'profile')
 
     def __init__(self, **options):
         super().__init__(**options)
+        self.layers = self.required_layers()
+        self.cache = None
+        if self.options.cache:
+            self.cache = ResultCache(self.options.cache,
+                                     self.options.cache_size * 2 ** 20)
+        # Set up backbone extraction.
+        self.backbone = [method for method in self.options.backbone
+                         if method]
+        if self.backbone and BACKBONE_METHODS is None:
+            logging.error('NumPy needs to be installed for backbone '
+                          'extraction.')
+            sys.exit(-1)
+        for method in self.backbone:
+            if method not in BACKBONE_METHODS:
+                logging.error('Backbone method "{}" is not supported.'.format(
+                        method))
+                sys.exit(-1)
+        if self.options.token_encoding not in ('ids', 'runs', 'count'):
+            logging.error('Token encoding "{}" is not supported.'.format(
+                    self.options.token_encoding))
+            sys.exit(-1)
+        # Results shared between the configurations of a sweep.
+        self.memo = {}
+        self.configurations = []
+        if self.options.sweep and self.options.sweep[0]:
+            for config in self.options.sweep:
+                worker = self.make_configuration(
+                        self.parse_configuration(config))
+                self.configurations.append((config, worker))
+                self.layers.extend(layer for layer in worker.layers
+                                   if layer not in self.layers)
         # Set up stop-words
         self.stopwords = []
         if self.options.stopwords and self.options.stopwords[0]:
@@ -68,6 +156,15 @@ class TokenTestingWorker(AddingWorker):
                 logging.error('No stopwords list "{}".'.format(
                         self.options.stopwords_preset))
                 sys.exit(-1)
+        # Set up entity resolution.
+        try:
+            self.entity_classes = parse_class_map(self.options.entity_classes)
+        except ValueError as e:
+            logging.error('Entity class mapping "{}" is not of the form '
+                          'RAW:CANON.'.format(e))
+            sys.exit(-1)
+        self.actors = frozenset(self.options.actors)
+        self.resolution = None
         # Set up filtering.
         # First, check hard-coded variants
         if self.options.nodes == 'postag':
@@ -83,18 +180,22 @@ class TokenTestingWorker(AddingWorker):
                 logging.error('No postag "{}" in tagset.'.format(
                               self.options.postag))
                 sys.exit(-1)
-            def test_token_postag(self, token, resolve=True):
-                has_pos = False
+            def has_pos(token):
                 for postag in POS:
                     if token.postag.is_a(postag):
-                        has_pos = True
-                        break
-                if has_pos:
-                    return self.test_token_stopwords(token)
-                if resolve and token.reference is not None:
-                    for reftoken in token.reference.tokens:
-                        if test_token_postag(self, reftoken, False):
-                            return self.test_token_stopwords(reftoken)
+                        return True
+                return False
+            name = ('postag',) + tuple(self.options.postag)
+            def test_token_postag(self, token, resolve=True):
+                if not resolve:
+                    return has_pos(token) and self.test_token_stopwords(token)
+                # The token itself if it has the postag, else the tokens of
+                # its reference that have it.
+                reftokens = self.resolution_index().resolve(
+                        name, has_pos).get(token.id, ())
+                for reftoken in reftokens:
+                    if self.test_token_stopwords(reftoken):
+                        return True
                 return False
             self.test_token = MethodType(test_token_postag, self)
         # Then, check dynamic variants
@@ -107,6 +208,345 @@ class TokenTestingWorker(AddingWorker):
                         self.options.nodes))
                 sys.exit(-1)
 
+    def required_layers(self):
+        """
+        Return the names of the TCF layers the worker reads.
+
+        Only these layers are built when parsing the input. Subclasses
+        extend the list with the layers their graph building method needs.
+
+        """
+        layers = ['tokens', 'POStags', 'namedEntities', 'references']
+        # Labels like `lemma` or `semantic_unit` need further token layers.
+        if {self.options.label, self.options.stopwords_feature} - {'text'}:
+            layers.extend(['lemmas', 'wsd'])
+        return layers
+
+    def parse_configuration(self, config):
+        """
+        Parse a sweep configuration of the form `key=value,key=value`.
+
+        List options can be given several times, e.g. `window=2,window=5`.
+        The options in :attr:`shared_options` cannot be set per
+        configuration.
+
+        :returns:
+            - A dict of options.
+
+        """
+        items = []
+        for item in config.split(','):
+            key, sep, value = item.partition('=')
+            if (not sep or key not in self.__options__
+                    or key in self.shared_options):
+                logging.error('Invalid configuration "{}".'.format(config))
+                sys.exit(-1)
+            items.append((key, value))
+        return parse_options(type(self), items)
+
+    def make_configuration(self, options):
+        """
+        Return a worker with the current options, updated by `options`.
+
+        The worker is meant to build graphs for the corpus of this worker,
+        see :meth:`add_annotations`.
+
+        """
+        worker_options = vars(self.options).copy()
+        worker_options.update(sweep=[''], cache='', metrics='', profile='')
+        worker_options.update(options)
+        return type(self)(**worker_options)
+
+    def share_corpus(self, worker):
+        """
+        Let `worker` build graphs for the current corpus of this worker.
+
+        The worker shares the corpus, the memo, the metrics and the cache,
+        so it can be used like this worker after :meth:`setup`.
+
+        """
+        worker.corpus = self.corpus
+        worker.memo = self.memo
+        worker.metrics = self.metrics
+        worker.cache = self.cache
+        worker.input_hash = getattr(self, 'input_hash', None)
+        worker.resolution = None
+
+    def setup(self, input_data):
+        self.memo = {}
+        self.resolution = None
+        if isinstance(input_data, tcf.TextCorpus):
+            self.corpus = input_data
+        else:
+            with self.metrics.stage('parse'):
+                self.corpus = LazyTextCorpus(input_data, layers=self.layers)
+        if self.cache is not None:
+            with self.metrics.stage('cache'):
+                self.input_hash = hash_layers(self.corpus, self.layers)
+
+    def process(self, input_data):
+        self.setup(input_data)
+        key = None
+        if self.cache is not None:
+            key = self.cache_key('layers', self.result_options())
+            if self.add_cached_layers(key):
+                return self.corpus
+            # Only the layers added below are cached. Layers added to the
+            # input before are serialized now, so they are not among them.
+            n_layers = len(corpus_element(self.corpus.tree))
+        self.add_annotations()
+        # Build the XML of the added layers now, so that it is measured.
+        with self.metrics.stage('serialization'):
+            tree = self.corpus.tree
+        if key is not None:
+            with self.metrics.stage('cache'):
+                self.cache.put_elements(key,
+                                        corpus_element(tree)[n_layers:])
+        return self.corpus
+
+    def add_annotations(self):
+        """
+        Build the graph and add it to the corpus.
+
+        In sweep mode, a graph is built for each configuration. The workers
+        of all configurations share the corpus and the results of
+        :meth:`memoized`, so that e.g. tokens are only filtered once.
+
+        """
+        if not self.configurations:
+            graph = self.extract_backbone(self.build_graph())
+            logging.info('Graph has {} nodes and {} edges.'.format(
+                    len(graph.nodes),
+                    len(graph.edges)))
+            with self.metrics.stage('serialization'):
+                add_graph_layer(self.corpus, self.graph_element(graph))
+            self.add_derived_graphs(graph)
+            return
+        for config, worker in self.configurations:
+            logging.info('Building graph for configuration "{}".'.format(
+                    config))
+            self.share_corpus(worker)
+            try:
+                graph = worker.extract_backbone(worker.build_graph())
+                logging.info('Graph has {} nodes and {} edges.'.format(
+                        len(graph.nodes),
+                        len(graph.edges)))
+                with self.metrics.stage('serialization'):
+                    add_graph_layer(self.corpus, worker.graph_element(graph),
+                                    config)
+                worker.add_derived_graphs(graph, config)
+            finally:
+                worker.corpus = None
+
+    def build_graph(self):
+        logging.warn('No graph building method set.')
+
+    def add_derived_graphs(self, graph, config=None):
+        """
+        Add the graphs derived from `graph` as additional graph layers.
+
+        Their labels are appended to the `config` of the graph.
+
+        """
+        for label, derived in self.derived_graphs(graph):
+            if config:
+                label = '{},{}'.format(config, label)
+            logging.info('Graph "{}" has {} nodes and {} edges.'.format(
+                    label, derived._graph.vcount(), derived._graph.ecount()))
+            with self.metrics.stage('serialization'):
+                add_graph_layer(self.corpus,
+                                self.encode_tokens(derived.tcf, derived),
+                                label)
+
+    def derived_graphs(self, graph):
+        """
+        Return a list of `(label, graph)` tuples of graphs derived from
+        `graph`, e.g. projections. By default, there are none.
+
+        """
+        return []
+
+    def graph_element(self, graph):
+        """
+        Serialize `graph` into a graph layer element.
+
+        Subclasses can extend the element with further annotations.
+
+        """
+        return self.encode_tokens(graph.tcf, graph)
+
+    def encode_tokens(self, graph_elem, graph):
+        """
+        Encode the tokens of nodes according to the option `token_encoding`.
+
+        With `ids`, nodes list the IDs of their tokens in `tokenIDs`. With
+        `runs`, the token positions are encoded as runs in `tokenRuns`
+        instead, see :func:`tcfnetworks.utils.encode_token_runs`. With
+        `count`, nodes only keep their `count`, and edges do not list their
+        token pairs.
+
+        :parameters:
+            - `graph_elem`: The serialized `graph`.
+            - `graph`: A :class:`tcflib.tcf.Graph`.
+        :returns:
+            - The graph element.
+
+        """
+        encoding = self.options.token_encoding
+        if encoding == 'ids':
+            return graph_elem
+        if encoding == 'runs':
+            positions = self.memoized('positions', (),
+                    lambda: {id(token): i for i, token
+                             in enumerate(self.corpus.tokens)})
+        node_elems = graph_elem.find(tcf.P_TEXT + 'nodes')
+        for node_elem, vertex in zip(node_elems, graph._graph.vs):
+            if 'tokenIDs' not in node_elem.attrib:
+                continue
+            del node_elem.attrib['tokenIDs']
+            if encoding == 'runs':
+                node_elem.set('tokenRuns', encode_token_runs(sorted(
+                        positions[id(token)] for token in vertex['tokens'])))
+        if encoding == 'count':
+            for edge_elem in graph_elem.find(tcf.P_TEXT + 'edges'):
+                del edge_elem[:]
+        return graph_elem
+
+    def extract_backbone(self, graph):
+        """
+        Remove edges that are not part of the backbone of `graph`.
+
+        The methods given by the option `backbone` are applied in order.
+
+        :returns:
+            - The graph.
+
+        """
+        if not self.backbone:
+            return graph
+        n_edges = graph._graph.ecount()
+        with self.metrics.stage('backbone'):
+            kept = extract_backbone(graph, self.backbone,
+                                    alpha=self.options.backbone_alpha,
+                                    k=self.options.backbone_k)
+        for method, n_kept in kept:
+            logging.info('Backbone method "{}" kept {} of {} edges.'.format(
+                    method, n_kept, n_edges))
+            self.metrics.count('backbone_{}'.format(method), n_kept)
+            n_edges = n_kept
+        return graph
+
+    def resolution_index(self):
+        """
+        Return the :class:`ResolutionIndex
+        <tcfnetworks.resolution.ResolutionIndex>` of the corpus.
+
+        It is built on first use and shared between the configurations of a
+        sweep.
+
+        """
+        if self.resolution is None:
+            with self.metrics.stage('resolution'):
+                self.resolution = self.memoized('resolution',
+                        ('entity_classes',),
+                        lambda: ResolutionIndex(self.corpus,
+                                                self.entity_classes))
+        return self.resolution
+
+    def memoized(self, name, options, function):
+        """
+        Return the result of `function`, computing it only once per input.
+
+        Results are shared between the configurations of a sweep, so they
+        must only depend on the corpus and the given options.
+
+        :parameters:
+            - `name`: The name of the result.
+            - `options`: The names of the options the result depends on.
+            - `function`: A callable without arguments computing the result.
+
+        """
+        key = (name,) + tuple(repr(getattr(self.options, option))
+                              for option in options)
+        try:
+            return self.memo[key]
+        except KeyError:
+            result = self.memo[key] = function()
+            return result
+
+    def result_options(self):
+        """
+        Return the options that influence the result as a dict.
+
+        They are part of the cache key of the result.
+
+        """
+        return cached_options(self.options, self.uncached_options)
+
+    def cache_key(self, name, options):
+        """
+        Return the cache key of a result for the current input.
+
+        :parameters:
+            - `name`: The name of the result, e.g. `layers`.
+            - `options`: A dict of the options the result depends on.
+        :returns:
+            - The key as a hex string.
+
+        """
+        return self.cache.key(type(self).__name__, name, self.input_hash,
+                              options)
+
+    def add_cached_layers(self, key):
+        """
+        Add the layers stored for `key` to the corpus.
+
+        :returns:
+            - True on a cache hit, else False.
+
+        """
+        with self.metrics.stage('cache'):
+            layers = self.cache.get_elements(key)
+            if layers is None:
+                self.metrics.count('cache_misses')
+                return False
+            corpus_elem = corpus_element(self.corpus.tree)
+            for layer_elem in layers:
+                corpus_elem.append(layer_elem)
+        self.metrics.count('cache_hits')
+        logging.info('Using cached result.')
+        return True
+
+    def filter_tokens(self, tokens):
+        """Return the list of `tokens` that pass the token test."""
+        with self.metrics.stage('filter'):
+            filtered = [token for token in tokens if self.test_token(token)]
+        if self.metrics.enabled:
+            self.metrics.count('tokens', len(tokens))
+            self.metrics.count('tokens_filtered', len(tokens) - len(filtered))
+        return filtered
+
+    def count_edges(self, graph, pairs, loops):
+        """
+        Update the edge counters of the metrics.
+
+        Edges that are not new are merged into existing ones. Their number
+        is derived from the number of edges in the graph, so the hot loops
+        only need to count pairs and loops.
+
+        """
+        if self.metrics.enabled:
+            metrics = self.metrics
+            edges = graph._graph.ecount()
+            # Remember the edges counted so far per graph, as a sweep
+            # builds several graphs.
+            new_edges = edges - getattr(graph, 'counted_edges', 0)
+            graph.counted_edges = edges
+            metrics.count('pairs_examined', pairs)
+            metrics.count('loops_skipped', loops)
+            metrics.count('edges_merged', pairs - loops - new_edges)
+            metrics.count('edges', new_edges)
+
     def test_token(self):
         logging.warn('No token test method set.')
 
@@ -153,22 +593,14 @@ class TokenTestingWorker(AddingWorker):
         return True
 
     def test_token_entity(self, token, resolve=True):
-        if token.entity is not None:
-            return True
-        if resolve and token.reference is not None:
-            for reftoken in token.reference.tokens:
-                if self.test_token_entity(reftoken, False):
-                    return True
-        return False
+        if not resolve:
+            return token.entity is not None
+        return token.id in self.resolution_index().classes
 
     def test_token_actor(self, token, resolve=True):
-        if token.entity is not None:
-            if token.entity.class_ in ('PER', 'PERSON',
-                                       'ORG', 'ORGANIZATION'):
-                # FIXME: Use proper tags instead of hardcoded CoNLL2002 tags.
-                return True
-        if resolve and token.reference is not None:
-            for reftoken in token.reference.tokens:
-                if self.test_token_actor(reftoken, False):
-                    return True
-        return False
+        if not resolve:
+            return (token.entity is not None and
+                    self.resolution_index().canonical_class(
+                            token.entity.class_) in self.actors)
+        classes = self.resolution_index().classes.get(token.id)
+        return classes is not None and not classes.isdisjoint(self.actors)
@@ -24,15 +24,17 @@ This annotator implements cooccurrence networks as a TCF compatible service.
 import sys
 import os
 import logging
+from array import array
 from itertools import combinations
 from collections import Counter
 from math import log
 
-from tqdm import tqdm
+from lxml import etree
 from tcflib import tcf
 from tcflib.service import run_as_cli
 
 from tcfnetworks.annotators.base import TokenTestingWorker
+from tcfnetworks.counting import SpillingPairCounter
 
 
 def n_grams(a, n, nofadeout=False):
@@ -59,7 +61,13 @@ class CooccurrenceWorker(TokenTestingWorker):
         'nofadeout': False,  # prevent thin connections at span borders
         'unique': False,
         'weight': 'count',  # 'count', 'llr' or 'pmi'
+        'spill': False,  # count window edges in external memory
+        'memory_budget': 256,  # in MiB, for spill=True
+        'slices': '',  # spantype of slices for snapshots, or 'sentence'
+        'cumulative': False,  # snapshots accumulate previous slices
     })
+    uncached_options = TokenTestingWorker.uncached_options + (
+            'memory_budget',)
 
     def __init__(self, **options):
         super().__init__(**options)
@@ -73,16 +81,33 @@ class CooccurrenceWorker(TokenTestingWorker):
             logging.error('Method "{}" is not supported.'.format(
                     self.options.method))
             sys.exit(-1)
+        if self.options.slices and self.options.spill:
+            logging.error('Snapshots require the token pairs of edges, '
+                          'which are not kept with spill=True.')
+            sys.exit(-1)
 
-    def add_annotations(self):
-        graph = self.build_graph()
-        logging.info('Graph has {} nodes and {} edges.'.format(
-                len(graph.nodes),
-                len(graph.edges)))
-        self.corpus.add_layer(graph)
+    def result_options(self):
+        options = super().result_options()
+        if self.options.token_encoding == 'count':
+            # Spilling only drops the token pairs of edges, which are not
+            # written anyway.
+            del options['spill']
+        return options
 
-    def build_graph(self):
-        logging.warn('No graph building method set.')
+    def required_layers(self):
+        layers = super().required_layers()
+        method = self.options.method
+        if method.startswith('sentence') or (
+                method == 'window' and self.options.spantype == 'sentence'):
+            layers.append('sentences')
+        elif method.startswith('textspan') or (
+                method == 'window' and self.options.spantype):
+            layers.append('textstructure')
+        if self.options.slices == 'sentence':
+            layers.append('sentences')
+        elif self.options.slices:
+            layers.append('textstructure')
+        return layers
 
     def build_graph_window(self):
         """
@@ -100,27 +125,61 @@ class CooccurrenceWorker(TokenTestingWorker):
         pathways-meaning-circulation-text-network-analysis/>.
 
         """
+        if self.options.spill:
+            return self.build_graph_window_spilling()
         graph = None
+        sequences = self.token_sequences()
         for window in self.options.window:
             logging.info('Building network with window {}.'.format(window))
-            if self.options.spantype:
-                # When passing the spantype parameter, the network is built for
-                # each span (e.g., paragraph) separately.
-                if self.options.spantype == 'sentence':
-                    textspans = self.corpus.sentences
-                else:
-                    textspans = [span for span in self.corpus.textstructure
-                                 if span.type == self.options.spantype]
-                for span in textspans:
-                    tokens = [token for token in span.tokens
-                                  if self.test_token(token)]
-                    graph = self.build_graph_window_real(tokens, window, graph)
-            else:
-                tokens = [token for token in self.corpus.tokens
-                              if self.test_token(token)]
+            for tokens in sequences:
                 graph = self.build_graph_window_real(tokens, window, graph)
         return graph
 
+    def token_sequences(self):
+        """
+        Return the filtered token sequences windows are moved over.
+
+        This is a single sequence of all tokens, or one sequence per span if
+        the option `spantype` is set. With a cache, the sequences are
+        stored as token IDs, so they can be reused for another `window` or
+        `weight`. In sweep mode, the sequences are shared between all
+        configurations with the same filter options.
+
+        """
+        return self.memoized('sequences',
+                             self.filter_options + ('spantype',),
+                             self.load_token_sequences)
+
+    def load_token_sequences(self):
+        if self.cache is None:
+            return self.filter_token_sequences()
+        options = {key: getattr(self.options, key)
+                   for key in self.filter_options + ('spantype',)}
+        key = self.cache_key('sequences', options)
+        with self.metrics.stage('cache'):
+            sequences = self.cache.get_json(key)
+        if sequences is not None:
+            tokens = self.corpus.tokens
+            return [[tokens[token_id] for token_id in sequence]
+                    for sequence in sequences]
+        sequences = self.filter_token_sequences()
+        with self.metrics.stage('cache'):
+            self.cache.put_json(key, [[token.id for token in tokens]
+                                      for tokens in sequences])
+        return sequences
+
+    def filter_token_sequences(self):
+        if self.options.spantype:
+            # When passing the spantype parameter, the network is built for
+            # each span (e.g., paragraph) separately.
+            if self.options.spantype == 'sentence':
+                textspans = self.corpus.sentences
+            else:
+                textspans = [span for span in self.corpus.textstructure
+                             if span.type == self.options.spantype]
+            return [self.filter_tokens(span.tokens) for span in textspans]
+        return [self.filter_tokens(self.corpus.tokens)]
+
     def build_graph_window_real(self, tokens, window=2, graph=None):
         """
         This function does all the heavy-lifting of creating a graph from
@@ -137,17 +196,103 @@ class CooccurrenceWorker(TokenTestingWorker):
         if graph == None:
             graph = tcf.Graph(label=self.options.label,
                               weight=self.options.weight)
-        for token in tqdm(tokens, desc='Adding nodes'):
-            graph.node_for_token(token)
-        for n_gram in tqdm(n_grams(tokens, window,
-                                   nofadeout=self.options.nofadeout),
-                           desc='Adding edges'):
-            # try all combinations of words within window
-            for combo in combinations(n_gram, 2):
-                try:
-                    graph.edge_for_tokens(*combo, unique=self.options.unique)
-                except tcf.LoopError:
-                    continue
+        with self.metrics.stage('nodes'):
+            for token in tokens:
+                graph.node_for_token(token)
+        pairs = loops = 0
+        with self.metrics.stage('edges'):
+            for n_gram in n_grams(tokens, window,
+                                  nofadeout=self.options.nofadeout):
+                # try all combinations of words within window
+                for combo in combinations(n_gram, 2):
+                    pairs += 1
+                    try:
+                        graph.edge_for_tokens(*combo,
+                                              unique=self.options.unique)
+                    except tcf.LoopError:
+                        loops += 1
+                        continue
+        self.count_edges(graph, pairs, loops)
+        return graph
+
+    def build_graph_window_spilling(self):
+        """
+        Build a window cooccurrence network in external memory.
+
+        Instead of adding each edge to the graph, node pairs are counted by
+        a :class:`SpillingPairCounter <tcfnetworks.counting.SpillingPairCounter>`,
+        which spills sorted chunks to disk once the `memory_budget` is
+        exhausted. With `unique`, token pairs are counted first, so that each
+        pair of token instances contributes only once. The budget is then
+        split between the counters of token pairs and of node pairs.
+
+        Node and edge weights are the same as with
+        :meth:`build_graph_window_real`. The individual token pairs of edges
+        are not kept, since they are what exceeds the memory.
+
+        """
+        graph = tcf.Graph(label=self.options.label,
+                          weight=self.options.weight)
+        budget = self.options.memory_budget * 2 ** 20
+        unique = self.options.unique
+        if unique:
+            # Token pairs and node pairs are counted separately.
+            budget //= 2
+        sequences = self.token_sequences()
+        with self.metrics.stage('nodes'):
+            # Map tokens to node indices. Token indices are only required
+            # for unique counting.
+            token_index = {}
+            token_nodes = array('L')
+            for tokens in sequences:
+                for token in tokens:
+                    if id(token) not in token_index:
+                        token_index[id(token)] = len(token_nodes)
+                        token_nodes.append(graph.node_for_token(token).index)
+        pairs = loops = 0
+        with SpillingPairCounter(budget) as counter, \
+                SpillingPairCounter(budget) as node_counter:
+            with self.metrics.stage('edges'):
+                for window in self.options.window:
+                    logging.info('Counting edges with window {}.'.format(
+                            window))
+                    for tokens in sequences:
+                        indices = [token_index[id(token)] for token in tokens]
+                        for n_gram in n_grams(indices, window,
+                                              nofadeout=self.options.nofadeout):
+                            for a, b in combinations(n_gram, 2):
+                                pairs += 1
+                                node_a, node_b = token_nodes[a], token_nodes[b]
+                                if node_a == node_b:
+                                    loops += 1
+                                elif unique:
+                                    counter.add(min(a, b), max(a, b))
+                                else:
+                                    counter.add(min(node_a, node_b),
+                                                max(node_a, node_b))
+            with self.metrics.stage('merge'):
+                runs = 0
+                if unique:
+                    # Each distinct token pair counts once for its nodes.
+                    for a, b, count in counter:
+                        node_a, node_b = token_nodes[a], token_nodes[b]
+                        node_counter.add(min(node_a, node_b),
+                                         max(node_a, node_b))
+                    runs = counter.n_spilled
+                    counter.close()
+                    counter = node_counter
+                edges, weights = [], []
+                for node_a, node_b, count in counter:
+                    edges.append((node_a, node_b))
+                    weights.append(count)
+                    if len(edges) >= counter.chunk_size:
+                        graph._graph.add_edges(edges, {'weight': weights})
+                        edges, weights = [], []
+                graph._graph.add_edges(edges, {'weight': weights})
+                runs += counter.n_spilled
+        if self.metrics.enabled:
+            self.metrics.count('spilled_runs', runs)
+        self.count_edges(graph, pairs, loops)
         return graph
 
     def build_graph_textspan(self, window=False):
@@ -179,20 +324,135 @@ class CooccurrenceWorker(TokenTestingWorker):
                     for span_old in n_gram:
                         span.tokens.extend(span_old.tokens)
                     textspans.append(span)
+        # The filtered spans only depend on these options, so they are
+        # shared between configurations that differ otherwise.
+        spans_tokens = self.memoized('spans', self.filter_options + (
+                'method', 'spantype', 'window'),
+                lambda: [set(self.filter_tokens(span.tokens))
+                         for span in textspans])
         n = len(textspans)
-        for i, span in enumerate(textspans, start=1):
+        for i, tokens in enumerate(spans_tokens, start=1):
             logging.debug('Creating network for textspan {}/{}.'.format(i, n))
-            tokens = set([token for token in span.tokens
-                          if self.test_token(token)])
             logging.debug('Using {} tokens.'.format(len(tokens)))
-            for token in tokens:
-                graph.node_for_token(token)
-            for combo in combinations(tokens, 2):
-                try:
-                    graph.edge_for_tokens(*combo, unique=self.options.unique)
-                except tcf.LoopError:
-                    continue
+            with self.metrics.stage('nodes'):
+                for token in tokens:
+                    graph.node_for_token(token)
+            pairs = loops = 0
+            with self.metrics.stage('edges'):
+                for combo in combinations(tokens, 2):
+                    pairs += 1
+                    try:
+                        graph.edge_for_tokens(*combo,
+                                              unique=self.options.unique)
+                    except tcf.LoopError:
+                        loops += 1
+                        continue
+            self.count_edges(graph, pairs, loops)
         return graph
 
+    def graph_element(self, graph):
+        graph_elem = super().graph_element(graph)
+        if self.options.slices:
+            with self.metrics.stage('snapshots'):
+                graph_elem.append(self.snapshots_element(graph))
+        return graph_elem
+
+    def slice_spans(self):
+        """Return the spans that form the slices of the corpus."""
+        if self.options.slices == 'sentence':
+            return list(self.corpus.sentences)
+        return [span for span in self.corpus.textstructure
+                if span.type == self.options.slices]
+
+    def token_slices(self):
+        """
+        Return a dict mapping token object IDs to slice numbers.
+
+        Tokens that are not part of a slice belong to the preceding slice,
+        or the first slice if they precede all slices.
+
+        """
+        span_slices = {}
+        for i, span in enumerate(self.slice_spans()):
+            for token in span.tokens:
+                span_slices.setdefault(id(token), i)
+        token_slices = {}
+        current = 0
+        for token in self.corpus.tokens:
+            current = span_slices.get(id(token), current)
+            token_slices[id(token)] = current
+        return token_slices
+
+    def snapshots_element(self, graph):
+        """
+        Serialize the evolution of `graph` over the slices of the corpus.
+
+        Each token pair of an edge is counted in the slice in which its
+        later token occurs. A snapshot holds the edges of a slice (or, if
+        `cumulative` is set, of all slices up to it) as a delta to the
+        previous snapshot: edges that were `added`, `removed` or
+        `reweighted`. Nodes are referenced by the IDs of the graph layer,
+        so all snapshots share a single node index.
+
+        :parameters:
+            - `graph`: The graph built from all slices.
+        :returns:
+            - A `snapshots` element.
+
+        """
+        spans = self.slice_spans()
+        token_slices = self.memoized('slices', ('slices',),
+                                     self.token_slices)
+        # Count edge weights per slice in a single pass over all token
+        # pairs. Weights are counts, even for cooccurrence measures.
+        slice_weights = [Counter() for span in spans] or [Counter()]
+        edges = graph._graph.es
+        if len(edges):
+            for edge in edges:
+                for (a, b), weight in edge['tokens'].items():
+                    i = max(token_slices[id(a)], token_slices[id(b)])
+                    slice_weights[i][edge.index] += weight
+        snapshots_elem = etree.Element(tcf.P_TEXT + 'snapshots',
+                slices=self.options.slices,
+                cumulative=str(self.options.cumulative).lower())
+        nid = 'n_{}'
+        previous = {}
+        for i, weights in enumerate(slice_weights):
+            snapshot_elem = etree.SubElement(snapshots_elem,
+                                             tcf.P_TEXT + 'snapshot',
+                                             ID='s_{}'.format(i))
+            if i < len(spans) and spans[i].tokens:
+                snapshot_elem.set('start', spans[i].tokens[0].id)
+                snapshot_elem.set('end', spans[i].tokens[-1].id)
+            # Collect (edge index, old weight, new weight) of changed edges.
+            if self.options.cumulative:
+                # Only edges with token pairs in this slice change.
+                deltas = []
+                for index in sorted(weights):
+                    old = previous.get(index, 0)
+                    previous[index] = old + weights[index]
+                    deltas.append((index, old, previous[index]))
+            else:
+                indices = sorted(previous.keys() | weights.keys())
+                deltas = [(index, previous.get(index, 0),
+                           weights.get(index, 0)) for index in indices]
+                previous = weights
+            for index, old, new in deltas:
+                if old == new:
+                    continue
+                elif not old:
+                    tag = 'added'
+                elif not new:
+                    tag = 'removed'
+                else:
+                    tag = 'reweighted'
+                edge = edges[index]
+                delta_elem = etree.SubElement(snapshot_elem, tcf.P_TEXT + tag,
+                                              source=nid.format(edge.source),
+                                              target=nid.format(edge.target))
+                if new:
+                    delta_elem.set('weight', str(new))
+        return snapshots_elem
+
 if __name__ == '__main__':
     run_as_cli(CooccurrenceWorker)
@@ -32,6 +32,10 @@ from tcflib.service import run_as_cli
 from tcflib.tagsets import TagSet
 
 from tcfnetworks.annotators.base import TokenTestingWorker
+try:
+    from tcfnetworks.projection import WEIGHTINGS, projection_graph
+except ImportError:
+    WEIGHTINGS = None
 
 ISOcat = TagSet('DC-1345')
 PUNCT = ISOcat['punctuation']
@@ -46,6 +50,9 @@ class DependencyWorker(TokenTestingWorker):
     __options__.update({
         'edges': 'dependency',
         'distance': 1,
+        'projection': [''],  # 'nouns' and/or 'verbs', for verbs_nouns edges
+        'projection_weight': 'count',  # 'count', 'newman' or 'hyperbolic'
+        'projection_topk': 0,  # keep the k strongest edges per node
     })
 
     def __init__(self, **options):
@@ -59,32 +66,82 @@ class DependencyWorker(TokenTestingWorker):
             logging.error('Method "{}" is not supported.'.format(
                     self.options.edges))
             sys.exit(-1)
-
-    def add_annotations(self):
-        # Create igraph.Graph.
-        graph = self.build_graph()
-        logging.info('Graph has {} nodes and {} edges.'.format(
-                len(graph.nodes),
-                len(graph.edges)))
-        self.corpus.add_layer(graph)
+        # Set up bipartite projections.
+        self.projections = [mode for mode in self.options.projection
+                            if mode]
+        if self.projections:
+            if self.options.edges != 'verbs_nouns':
+                logging.error('Projections require edges="verbs_nouns".')
+                sys.exit(-1)
+            if WEIGHTINGS is None:
+                logging.error('NumPy and SciPy need to be installed for '
+                              'projections.')
+                sys.exit(-1)
+            for mode in self.projections:
+                if mode not in ('nouns', 'verbs'):
+                    logging.error('Projection "{}" is not supported.'.format(
+                            mode))
+                    sys.exit(-1)
+            if self.options.projection_weight not in WEIGHTINGS:
+                logging.error('Projection weight "{}" is not '
+                              'supported.'.format(
+                                      self.options.projection_weight))
+                sys.exit(-1)
+
+    def required_layers(self):
+        return super().required_layers() + ['depparsing']
 
     def build_graph(self):
         graph = None
-        for parse in self.corpus.depparsing:
-            graph = self.parse_to_graph(parse, graph=graph)
+        # Walking the parse trees only depends on the token filter and the
+        # edge method, so the walks are shared between sweep configurations.
+        parses_edges = self.memoized('dependencies',
+                                     self.filter_options + ('edges',),
+                                     self.find_parses_edges)
+        for parse, parse_edges in zip(self.corpus.depparsing, parses_edges):
+            with self.metrics.stage('edges'):
+                graph = self.parse_to_graph(parse, graph=graph,
+                                            edges=parse_edges)
         return graph
 
-    def parse_to_graph(self, parse, graph=None):
+    def derived_graphs(self, graph):
+        """
+        Return the one-mode projections of a bipartite verb–noun graph.
+
+        The noun projection links nouns that share verbs, the verb
+        projection links verbs that share nouns.
+
+        """
+        graphs = []
+        for mode in self.projections:
+            with self.metrics.stage('projection'):
+                projected = projection_graph(graph, mode == 'nouns',
+                        weighting=self.options.projection_weight,
+                        k=self.options.projection_topk)
+            graphs.append(('projection={}'.format(mode), projected))
+        return graphs
+
+    def find_parses_edges(self):
+        """Return a list of the token pairs found in each parse."""
+        with self.metrics.stage('traversal'):
+            return [list(self.find_edges(parse, parse.root))
+                    for parse in self.corpus.depparsing]
+
+    def parse_to_graph(self, parse, graph=None, edges=None):
         if graph is None:
             graph = tcf.Graph(label=self.options.label)
+        if edges is None:
+            edges = self.find_edges(parse, parse.root)
         # Store edges added for this parse, so we can build a subgraph.
         # This is required for adding edges if distance > 1.
         parse_edges = []
         # Also store all tokens. Required for checking token distance if
         # distance > 1.
         parse_tokens = set()
+        pairs = loops = 0
         # Walk the parse tree.
-        for tokens in self.find_edges(parse, parse.root):
+        for tokens in edges:
+            pairs += 1
             # Add nodes.
             for i, token in enumerate(tokens):
                 parse_tokens.add(token)
@@ -94,40 +151,58 @@ class DependencyWorker(TokenTestingWorker):
                     # source and target, it is 0 or 1. Since the verb
                     # is always source, we can use the boolean value of i
                     # to specify the type.
-                    vertex['type'] = bool(i)
+                    node['type'] = bool(i)
             # Add edges.
             try:
                 edge = graph.edge_for_tokens(*tokens)
             except tcf.LoopError:
+                loops += 1
                 continue
             else:
                 parse_edges.append(edge)
+        self.count_edges(graph, pairs, loops)
         if self.options.distance > 1:
-            # Add additional edges for each pair of nodes with path length <
-            # distance.
-            # Do not alter the graph while iteration. Store additional edges.
-            additional_edges = []
-            parse_graph = graph._graph.subgraph_edges(
-                    [e._edge for e in parse_edges])
-            for source, target in combinations(parse_tokens, 2):
-                source_node = graph.node_for_token(source)
-                target_node = graph.node_for_token(target)
-                try:
-                    distance = parse_graph.shortest_paths(source_node['name'],
-                                target_node['name'])[0][0]
-                except ValueError:
-                    # Token is not in the subgraph
-                    continue
-                if distance <= self.options.distance:
-                    additional_edges.append((source, target))
-            # Now add additional edges.
-            for source, target in additional_edges:
-                try:
-                    graph.edge_for_tokens(source, target)
-                except tcf.LoopError:
-                    continue
+            with self.metrics.stage('distance_edges'):
+                self.add_distance_edges(graph, parse_edges, parse_tokens)
         return graph
 
+    def add_distance_edges(self, graph, parse_edges, parse_tokens):
+        """
+        Add edges between all tokens of a parse within `distance`.
+
+        :parameters:
+            - `graph`: The graph the parse was added to.
+            - `parse_edges`: The edges added for the parse.
+            - `parse_tokens`: The tokens of the parse.
+
+        """
+        # Add additional edges for each pair of nodes with path length <
+        # distance.
+        # Do not alter the graph while iteration. Store additional edges.
+        additional_edges = []
+        parse_graph = graph._graph.subgraph_edges(
+                [e._edge for e in parse_edges])
+        for source, target in combinations(parse_tokens, 2):
+            source_node = graph.node_for_token(source)
+            target_node = graph.node_for_token(target)
+            try:
+                distance = parse_graph.shortest_paths(source_node['name'],
+                            target_node['name'])[0][0]
+            except ValueError:
+                # Token is not in the subgraph
+                continue
+            if distance <= self.options.distance:
+                additional_edges.append((source, target))
+        # Now add additional edges.
+        loops = 0
+        for source, target in additional_edges:
+            try:
+                graph.edge_for_tokens(source, target)
+            except tcf.LoopError:
+                loops += 1
+                continue
+        self.count_edges(graph, len(additional_edges), loops)
+
     def find_edges(self, parse, head):
         logging.warn('No edge detection method set.')
 
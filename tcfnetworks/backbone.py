@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module implements backbone extraction for weighted networks.
+
+Dense cooccurrence networks are hard to export and to lay out. A global
+weight threshold removes all edges of rare words, so the methods here keep
+edges that are significant or strong relative to their neighbourhood
+instead. All methods work on arrays of the edge list and return a boolean
+mask of the edges to keep.
+
+Implemented methods:
+
+- `disparity`: The disparity filter of Serrano, M. Ángeles, Marián Boguñá
+  and Alessandro Vespignani. 2009. „Extracting the multiscale backbone of
+  complex weighted networks“. PNAS 106 (16): 6483–6488.
+- `noise_corrected`: The noise-corrected backbone of Coscia, Michele and
+  Frank M. H. Neffke. 2017. „Network Backboning with Noisy Data“. ICDE
+  2017: 425–436.
+- `kcore`: Keep the k-core, i.e. the edges between nodes that have at
+  least k neighbours within the core.
+- `topk`: Keep the k strongest edges of each node.
+
+"""
+
+from statistics import NormalDist
+
+import numpy as np
+
+from tcfnetworks.utils import edge_arrays
+
+
+def node_sums(edges, values, n):
+    """Sum up `values` of undirected `edges` for each of the `n` nodes."""
+    return (np.bincount(edges[:, 0], weights=values, minlength=n)
+            + np.bincount(edges[:, 1], weights=values, minlength=n))
+
+
+def disparity(edges, weights, n, alpha=0.05, k=None):
+    """
+    Keep edges that are significant for at least one of their nodes.
+
+    An edge is significant for a node if its share of the node's strength
+    is unlikely under a uniform distribution of the strength over the
+    node's edges.
+
+    :parameters:
+        - `edges`: An integer array of shape `(E, 2)`.
+        - `weights`: A float array of shape `(E,)`.
+        - `n`: The number of nodes.
+        - `alpha`: The significance level.
+    :returns:
+        - A boolean array of shape `(E,)`.
+
+    """
+    strength = node_sums(edges, weights, n)
+    degree = node_sums(edges, np.ones(len(edges)), n)
+    keep = np.zeros(len(edges), dtype=bool)
+    for end in (0, 1):
+        nodes = edges[:, end]
+        p = weights / strength[nodes]
+        # Nodes with a single edge give no evidence, as (1 - p)^0 = 1.
+        keep |= (1 - p) ** (degree[nodes] - 1) < alpha
+    return keep
+
+
+def noise_corrected_scores(edges, weights, n):
+    """
+    Return the scores of the noise-corrected backbone and their variances.
+
+    The score compares the weight of an edge to the weight expected from
+    the strengths of both nodes. It ranges from -1 to 1. Its variance is
+    estimated with a Bayesian binomial model, so that edges between weak
+    nodes get a higher variance.
+
+    :parameters:
+        - `edges`: An integer array of shape `(E, 2)`.
+        - `weights`: A float array of shape `(E,)`.
+        - `n`: The number of nodes.
+    :returns:
+        - A float array of shape `(E,)` with the scores and one with their
+          variances.
+
+    """
+    strength = node_sums(edges, weights, n)
+    n_i = strength[edges[:, 0]]
+    n_j = strength[edges[:, 1]]
+    n_all = strength.sum()
+    n_ij = weights
+    with np.errstate(divide='ignore', invalid='ignore'):
+        kappa = n_all / (n_i * n_j)
+        score = (kappa * n_ij - 1) / (kappa * n_ij + 1)
+        prior_mean = n_i * n_j / n_all ** 2
+        prior_var = (n_i * n_j * (n_all - n_i) * (n_all - n_j)
+                     / (n_all ** 4 * (n_all - 1)))
+        alpha_prior = prior_mean ** 2 / prior_var * (1 - prior_mean) \
+                - prior_mean
+        beta_prior = prior_mean / prior_var * (1 - prior_mean ** 2) \
+                - (1 - prior_mean)
+        alpha_post = alpha_prior + n_ij
+        beta_post = n_all - n_ij + beta_prior
+        expected = alpha_post / (alpha_post + beta_post)
+        var_n_ij = expected * (1 - expected) * n_all
+        d = 1 / (n_i * n_j) - n_all * (n_i + n_j) / (n_i * n_j) ** 2
+        var_score = var_n_ij * (2 * (kappa + n_ij * d)
+                                / (kappa * n_ij + 1) ** 2) ** 2
+    return score, var_score
+
+
+def noise_corrected(edges, weights, n, alpha=0.05, k=None):
+    """
+    Keep edges whose weight exceeds the expected weight significantly.
+
+    An edge is kept if its score exceeds zero by more than delta standard
+    deviations, see :func:`noise_corrected_scores`.
+
+    :parameters:
+        - `edges`: An integer array of shape `(E, 2)`.
+        - `weights`: A float array of shape `(E,)`.
+        - `n`: The number of nodes.
+        - `alpha`: The significance level. It is converted into the
+          one-sided z-score the paper calls delta.
+    :returns:
+        - A boolean array of shape `(E,)`.
+
+    """
+    delta = NormalDist().inv_cdf(1 - alpha)
+    score, var_score = noise_corrected_scores(edges, weights, n)
+    with np.errstate(invalid='ignore'):
+        return score - delta * np.sqrt(var_score) > 0
+
+
+def kcore(edges, weights, n, alpha=None, k=2):
+    """
+    Keep the edges of the `k`-core.
+
+    Nodes with fewer than `k` edges are removed repeatedly, until all
+    remaining nodes have at least `k` edges.
+
+    :parameters:
+        - `edges`: An integer array of shape `(E, 2)`.
+        - `weights`: A float array of shape `(E,)`. Not used.
+        - `n`: The number of nodes.
+        - `k`: The minimum degree.
+    :returns:
+        - A boolean array of shape `(E,)`.
+
+    """
+    keep = np.ones(len(edges), dtype=bool)
+    while True:
+        degree = node_sums(edges[keep], np.ones(keep.sum()), n)
+        weak = degree < k
+        remove = keep & (weak[edges[:, 0]] | weak[edges[:, 1]])
+        if not remove.any():
+            return keep
+        keep &= ~remove
+
+
+def topk(edges, weights, n, alpha=None, k=2):
+    """
+    Keep the `k` strongest edges of each node.
+
+    An edge is kept if it is among the strongest edges of either of its
+    nodes. Ties are broken by edge order.
+
+    :parameters:
+        - `edges`: An integer array of shape `(E, 2)`.
+        - `weights`: A float array of shape `(E,)`.
+        - `n`: The number of nodes.
+        - `k`: The number of edges kept per node.
+    :returns:
+        - A boolean array of shape `(E,)`.
+
+    """
+    # List each edge once for both of its nodes.
+    nodes = np.concatenate([edges[:, 0], edges[:, 1]])
+    edge_ids = np.tile(np.arange(len(edges)), 2)
+    order = np.lexsort((edge_ids, -np.tile(weights, 2), nodes))
+    nodes, edge_ids = nodes[order], edge_ids[order]
+    # The rank of an edge among the edges of its node.
+    starts = np.flatnonzero(np.r_[True, nodes[1:] != nodes[:-1]])
+    rank = np.arange(len(nodes)) - np.repeat(starts,
+                                              np.diff(np.r_[starts,
+                                                            len(nodes)]))
+    keep = np.zeros(len(edges), dtype=bool)
+    keep[edge_ids[rank < k]] = True
+    return keep
+
+
+#: Maps method names to backbone functions.
+METHODS = {
+    'disparity': disparity,
+    'noise_corrected': noise_corrected,
+    'kcore': kcore,
+    'topk': topk,
+}
+
+
+def extract_backbone(graph, methods, alpha=0.05, k=2):
+    """
+    Remove all edges from `graph` that are not part of its backbone.
+
+    Several methods are applied one after the other, each to the edges the
+    previous one kept. Nodes are not removed.
+
+    :parameters:
+        - `graph`: A :class:`tcflib.tcf.Graph`. Edge weights are the raw
+          counts, even if the graph uses a cooccurrence measure, since
+          measures are calculated on serialization.
+        - `methods`: A list of method names, see :data:`METHODS`.
+        - `alpha`: The significance level of statistical methods.
+        - `k`: The parameter of the `kcore` and `topk` methods.
+    :returns:
+        - A list of `(method, edges kept)` tuples.
+
+    """
+    edges, weights = edge_arrays(graph)
+    n = graph._graph.vcount()
+    keep = np.ones(len(edges), dtype=bool)
+    kept = []
+    for method in methods:
+        indices = np.flatnonzero(keep)
+        mask = METHODS[method](edges[indices], weights[indices], n,
+                               alpha=alpha, k=k)
+        keep[indices[~mask]] = False
+        kept.append((method, int(mask.sum())))
+    graph._graph.delete_edges(np.flatnonzero(~keep).tolist())
+    return kept
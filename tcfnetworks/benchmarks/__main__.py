@@ -0,0 +1,3 @@
+from tcfnetworks.benchmarks.harness import main
+
+main()
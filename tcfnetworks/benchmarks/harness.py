@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module benchmarks the TCFnetworks workers on synthetic corpora.
+
+It times every combination of graph building options of the annotators,
+and every exporter, and records throughput and peak memory as JSON. A
+previous result file can be passed for regression comparison::
+
+    python -m tcfnetworks.benchmarks -n 500 -o results.json
+    python -m tcfnetworks.benchmarks -n 500 --compare results.json
+
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import logging
+import tracemalloc
+import multiprocessing
+from itertools import product
+from concurrent.futures import ProcessPoolExecutor
+
+from tcflib import tcf
+
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+from tcfnetworks.metrics import peak_rss
+from tcfnetworks.workers import get_worker_class
+
+COOCCURRENCE_METHODS = [
+    {'method': 'window'},
+    {'method': 'window', 'spantype': 'sentence'},
+    {'method': 'window', 'spantype': 'paragraph'},
+    {'method': 'sentence'},
+    {'method': 'sentence_window'},
+    {'method': 'textspan', 'spantype': 'paragraph'},
+    {'method': 'textspan_window', 'spantype': 'paragraph'},
+]
+COOCCURRENCE_WINDOWS = [[2], [5], [2, 5]]
+COOCCURRENCE_WEIGHTS = [
+    {'weight': 'count'},
+    {'weight': 'count', 'unique': True},
+    {'weight': 'llr', 'unique': True},
+    {'weight': 'pmi', 'unique': True},
+]
+DEPENDENCY_EDGES = ['dependency', 'extended_dependency', 'semantic',
+                    'verbs_nouns']
+DEPENDENCY_DISTANCES = [1, 2]
+EXPORTERS = ['graphml', 'json', 'd3_html']
+#: Memory is measured in fresh processes, not forked copies of this one.
+SPAWN = multiprocessing.get_context('spawn')
+
+
+def iter_cases():
+    """
+    Yield all benchmark cases as `(worker name, options, input)` tuples.
+
+    The input is either 'corpus' for the plain synthetic corpus or 'graph'
+    for the corpus with a cooccurrence graph layer.
+
+    """
+    for method, window, weight in product(COOCCURRENCE_METHODS,
+                                          COOCCURRENCE_WINDOWS,
+                                          COOCCURRENCE_WEIGHTS):
+        if window != [2] and not (method['method'] == 'window'
+                                  or method['method'].endswith('_window')):
+            # The window size does not affect these methods.
+            continue
+        options = dict(method, window=window, **weight)
+        yield ('cooccurrence', options, 'corpus')
+    for edges, distance in product(DEPENDENCY_EDGES, DEPENDENCY_DISTANCES):
+        yield ('dependency', {'edges': edges, 'distance': distance},
+               'corpus')
+    for name in EXPORTERS:
+        yield (name, {}, 'graph')
+
+
+def measure_rss(name, options, input_data):
+    """
+    Run a worker once and return the peak resident set size before and
+    after the run.
+
+    This is meant to be called in a fresh process, so that the peak only
+    includes the imports, the input and the run itself.
+
+    """
+    worker = get_worker_class(name)(**options)
+    baseline = peak_rss()
+    tcf.serialize(worker.run(input_data))
+    return baseline, peak_rss()
+
+
+def measure(name, options, input_data, repeat=3):
+    """
+    Run a worker on the input and measure time and peak memory.
+
+    The time is the best of `repeat` runs, including parsing and
+    serialization.
+
+    Memory is measured in separate runs. The peak resident set size
+    includes the memory that lxml and igraph allocate in C. It is measured
+    in a fresh process, since it cannot be reset. The Python heap peak is
+    traced with :mod:`tracemalloc`, which slows the worker down, and only
+    includes Python allocations.
+
+    :returns:
+        - A tuple of the time, a dict with the memory measurements in
+          bytes, and the output of the worker.
+
+    """
+    worker_class = get_worker_class(name)
+
+    def run():
+        worker = worker_class(**options)
+        return tcf.serialize(worker.run(input_data))
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = run()
+        times.append(time.perf_counter() - start)
+    with ProcessPoolExecutor(1, mp_context=SPAWN) as executor:
+        baseline_rss, rss = executor.submit(measure_rss, name, options,
+                                            input_data).result()
+    tracemalloc.start()
+    try:
+        run()
+        _, heap_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    memory = {
+        'peak_rss': rss,
+        'baseline_rss': baseline_rss,
+        'heap_peak': heap_peak,
+    }
+    return min(times), memory, output
+
+
+def run_benchmarks(sentences=200, vocabulary=500, seed=0, repeat=3,
+                   select=None):
+    """
+    Run all benchmark cases.
+
+    :parameters:
+        - `sentences`, `vocabulary`, `seed`: Parameters for the synthetic
+          corpus.
+        - `repeat`: The number of timed runs per case.
+        - `select`: If given, only run cases for these worker names.
+    :returns:
+        - A dict with metadata and one result per case.
+
+    """
+    corpus = generate_corpus(sentences=sentences, vocabulary=vocabulary,
+                             seed=seed)
+    n_tokens = corpus.count(b'<token ')
+    graph_corpus = tcf.serialize(get_worker_class('cooccurrence')().run(
+            corpus))
+    inputs = {'corpus': corpus, 'graph': graph_corpus}
+    results = []
+    for name, options, input_name in iter_cases():
+        if select and name not in select:
+            continue
+        result = {'worker': name, 'options': options, 'input': input_name}
+        logging.info('Running {} {}.'.format(name, options))
+        try:
+            seconds, memory, output = measure(name, options,
+                                              inputs[input_name], repeat)
+        except (Exception, SystemExit) as e:
+            logging.warning('{} {} failed: {!r}'.format(name, options, e))
+            result.update(status='error', error=repr(e))
+        else:
+            result.update(status='ok', seconds=seconds,
+                          tokens_per_second=n_tokens / seconds,
+                          output_size=len(output), **memory)
+        results.append(result)
+    return {
+        'meta': {
+            'sentences': sentences,
+            'vocabulary': vocabulary,
+            'seed': seed,
+            'tokens': n_tokens,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def case_key(result):
+    return (result['worker'], json.dumps(result['options'], sort_keys=True))
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Compare results to a baseline.
+
+    Memory is compared by the peak resident set size. Baselines that do
+    not have it are only compared by time.
+
+    :returns:
+        - A list of `(result, baseline result, time ratio, memory ratio)`
+          tuples for all cases that got slower or used more memory by more
+          than `threshold`.
+
+    """
+    baseline_results = {case_key(result): result
+                        for result in baseline['results']}
+    regressions = []
+    for result in results['results']:
+        old = baseline_results.get(case_key(result))
+        if old is None or 'ok' != result['status'] or 'ok' != old['status']:
+            continue
+        time_ratio = result['seconds'] / old['seconds']
+        memory_ratio = 1.0
+        if old.get('peak_rss'):
+            memory_ratio = result['peak_rss'] / old['peak_rss']
+        if time_ratio > 1 + threshold or memory_ratio > 1 + threshold:
+            regressions.append((result, old, time_ratio, memory_ratio))
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+            description='Benchmark the TCFnetworks workers.')
+    arg_parser.add_argument('-v', '--verbose', action='store_true')
+    arg_parser.add_argument('-n', '--sentences', type=int, default=200)
+    arg_parser.add_argument('--vocabulary', type=int, default=500)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('-r', '--repeat', type=int, default=3)
+    arg_parser.add_argument('-w', '--workers', nargs='*',
+                            help='Only benchmark these workers.')
+    arg_parser.add_argument('-o', '--outfile',
+                            help='Write results as JSON to this file.')
+    arg_parser.add_argument('--compare', metavar='BASELINE',
+                            help='Compare results to a previous result file.')
+    arg_parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Relative slowdown reported as regression.')
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose
+                        else logging.ERROR)
+    results = run_benchmarks(args.sentences, args.vocabulary, args.seed,
+                             args.repeat, args.workers)
+    if args.outfile:
+        with open(args.outfile, 'w') as outfile:
+            json.dump(results, outfile, indent=2)
+    for result in results['results']:
+        options = ' '.join('{}={}'.format(key, value)
+                           for key, value in sorted(result['options'].items()))
+        if result['status'] == 'ok':
+            print('{:<14} {:<60} {:8.3f}s {:10.0f} tok/s '
+                  '{:8.1f} MiB RSS {:8.1f} MiB heap'.format(
+                    result['worker'], options, result['seconds'],
+                    result['tokens_per_second'],
+                    result['peak_rss'] / 2 ** 20,
+                    result['heap_peak'] / 2 ** 20))
+        else:
+            print('{:<14} {:<60} {}'.format(result['worker'], options,
+                                            result['error']))
+    if args.compare:
+        with open(args.compare) as infile:
+            baseline = json.load(infile)
+        regressions = compare(results, baseline, args.threshold)
+        for result, old, time_ratio, memory_ratio in regressions:
+            print('REGRESSION {} {}: time x{:.2f}, memory x{:.2f}'.format(
+                    result['worker'], result['options'], time_ratio,
+                    memory_ratio))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
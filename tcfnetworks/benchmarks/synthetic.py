@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module generates synthetic TCF corpora for benchmarking.
+
+The corpora are deterministic for a given set of parameters and seed. They
+contain all layers the TCFnetworks workers read: tokens, sentences, lemmas,
+POS tags (DC-1345), named entities, references, text structure and
+dependency parses. Word frequencies follow a Zipf distribution, so that
+node degrees in the resulting graphs resemble those of real texts.
+
+"""
+
+import random
+import argparse
+
+from lxml import etree
+from tcflib import tcf
+
+# Sentence templates as sequences of DC-1345 POS tags. The first verb of a
+# sentence is the root of its dependency parse.
+TEMPLATES = [
+    ['definiteArticle', 'commonNoun', 'mainVerb', 'definiteArticle',
+     'adjective', 'commonNoun', 'mainPunctuation'],
+    ['properNoun', 'mainVerb', 'preposition', 'definiteArticle', 'commonNoun',
+     'adverb', 'mainPunctuation'],
+    ['personalPronoun', 'mainVerb', 'indefiniteArticle', 'commonNoun',
+     'coordinatingConjunction', 'properNoun', 'mainVerb', 'commonNoun',
+     'mainPunctuation'],
+    ['definiteArticle', 'adjective', 'commonNoun', 'preposition',
+     'properNoun', 'mainVerb', 'comma', 'personalPronoun', 'mainVerb',
+     'mainPunctuation'],
+    ['properNoun', 'copula', 'indefiniteArticle', 'adjective', 'commonNoun',
+     'mainPunctuation'],
+]
+
+# Closed word classes use a fixed word list, open ones a generated
+# vocabulary.
+CLOSED_WORDS = {
+    'definiteArticle': ['the'],
+    'indefiniteArticle': ['a'],
+    'preposition': ['in', 'on', 'with', 'of', 'for'],
+    'personalPronoun': ['he', 'she', 'it', 'they'],
+    'coordinatingConjunction': ['and', 'or', 'but'],
+    'copula': ['is'],
+    'mainPunctuation': ['.'],
+    'comma': [','],
+}
+
+# Dependents attach to the next token with one of these tags, if any.
+ATTACH_FORWARD = {
+    'definiteArticle': ('commonNoun',),
+    'indefiniteArticle': ('commonNoun',),
+    'adjective': ('commonNoun',),
+    'preposition': ('commonNoun', 'properNoun'),
+}
+
+ENTITY_CLASSES = ['PER', 'ORG', 'LOC']
+
+
+class CorpusGenerator:
+    """
+    A generator for synthetic TCF documents.
+
+    :parameters:
+        - `sentences`: The number of sentences.
+        - `vocabulary`: The number of distinct words per open word class.
+        - `paragraph_length`: The number of sentences per paragraph.
+        - `chapter_length`: The number of paragraphs per chapter.
+        - `reference_rate`: The share of pronouns that refer back to the
+          last proper noun.
+        - `seed`: The random seed.
+
+    """
+
+    def __init__(self, sentences=1000, vocabulary=500, paragraph_length=5,
+                 chapter_length=10, reference_rate=0.5, seed=0):
+        self.n_sentences = sentences
+        self.vocabulary = vocabulary
+        self.paragraph_length = paragraph_length
+        self.chapter_length = chapter_length
+        self.reference_rate = reference_rate
+        self.seed = seed
+        ranks = range(1, vocabulary + 1)
+        self.zipf_weights = [1 / rank for rank in ranks]
+
+    def word(self, rng, postag):
+        if postag in CLOSED_WORDS:
+            word = rng.choice(CLOSED_WORDS[postag])
+            return word, word
+        rank = rng.choices(range(self.vocabulary), self.zipf_weights)[0]
+        if postag == 'mainVerb':
+            lemma = 'verb{}'.format(rank)
+            return lemma + 's', lemma
+        if postag == 'properNoun':
+            word = 'Name{}'.format(rank)
+            return word, word
+        lemma = '{}{}'.format(postag.lower(), rank)
+        return lemma, lemma
+
+    def generate_tokens(self, rng):
+        """
+        Generate sentences as lists of `(text, lemma, postag, head)` tuples.
+
+        `head` is the index of the governing token within the sentence, or
+        None for the root.
+
+        """
+        for _ in range(self.n_sentences):
+            template = rng.choice(TEMPLATES)
+            words = [self.word(rng, postag) for postag in template]
+            verbs = [i for i, postag in enumerate(template)
+                     if postag in ('mainVerb', 'copula')]
+            root = verbs[0]
+            heads = []
+            for i, postag in enumerate(template):
+                if i == root:
+                    head = None
+                elif postag in ATTACH_FORWARD:
+                    head = next((j for j in range(i + 1, len(template))
+                                 if template[j] in ATTACH_FORWARD[postag]),
+                                root)
+                elif postag in ('mainVerb', 'copula'):
+                    head = root
+                else:
+                    # Attach to the closest verb.
+                    head = min(verbs, key=lambda j: abs(j - i))
+                    if head == i:
+                        head = root
+                heads.append(head)
+            yield [(text, lemma, postag, head) for (text, lemma), postag, head
+                   in zip(words, template, heads)]
+
+    def generate(self):
+        """Return a synthetic TCF document as bytes."""
+        rng = random.Random(self.seed)
+        E = lambda parent, tag, **attrib: etree.SubElement(
+                parent, tcf.P_TEXT + tag, **attrib)
+        root = etree.Element(tcf.P_DATA + 'D-Spin', nsmap={None: tcf.NS_DATA},
+                             version='0.4')
+        etree.SubElement(root, '{http://www.dspin.de/data/metadata}MetaData',
+                         nsmap={None: 'http://www.dspin.de/data/metadata'})
+        corpus = etree.SubElement(root, tcf.P_TEXT + 'TextCorpus',
+                                  nsmap={None: tcf.NS_TEXT}, lang='en')
+        text = E(corpus, 'text')
+        tokens = E(corpus, 'tokens')
+        sentences = E(corpus, 'sentences')
+        lemmas = E(corpus, 'lemmas')
+        postags = E(corpus, 'POStags', tagset='DC-1345')
+        entities = E(corpus, 'namedEntities', type='CoNLL2002')
+        references = E(corpus, 'references')
+        depparsing = E(corpus, 'depparsing', tagset='synthetic',
+                       emptytoks='false', multigovs='false')
+        textstructure = E(corpus, 'textstructure')
+        words = []
+        sentence_spans = []
+        # Coreference chains by proper noun, as lists of
+        # (token ID, antecedent token ID).
+        chains = {}
+        entity_classes = {}
+        last_name = None
+        n = 0
+        for s, sentence in enumerate(self.generate_tokens(rng)):
+            ids = ['t_{}'.format(n + i) for i in range(len(sentence))]
+            parse = E(depparsing, 'parse', ID='d_{}'.format(s))
+            for token_id, (word, lemma, postag, head) in zip(ids, sentence):
+                words.append(word)
+                E(tokens, 'token', ID=token_id).text = word
+                E(lemmas, 'lemma', tokenIDs=token_id).text = lemma
+                E(postags, 'tag', tokenIDs=token_id).text = postag
+                if head is None:
+                    E(parse, 'dependency', func='ROOT', depIDs=token_id)
+                else:
+                    E(parse, 'dependency', func='DEP', govIDs=ids[head],
+                      depIDs=token_id)
+                if postag == 'properNoun':
+                    if lemma not in entity_classes:
+                        entity_classes[lemma] = rng.choice(ENTITY_CLASSES)
+                    E(entities, 'entity', tokenIDs=token_id,
+                      **{'class': entity_classes[lemma]})
+                    chains.setdefault(lemma, []).append((token_id, None))
+                    last_name = lemma
+                elif (postag == 'personalPronoun' and last_name is not None
+                        and rng.random() < self.reference_rate):
+                    antecedent = chains[last_name][-1][0]
+                    chains[last_name].append((token_id, antecedent))
+            E(sentences, 'sentence', ID='s_{}'.format(s),
+              tokenIDs=' '.join(ids))
+            sentence_spans.append((ids[0], ids[-1]))
+            n += len(sentence)
+        text.text = ' '.join(words)
+        r = 0
+        for lemma, chain in chains.items():
+            entity = E(references, 'entity')
+            ref_ids = {}
+            for token_id, antecedent in chain:
+                ref_ids[token_id] = 'rc_{}'.format(r)
+                r += 1
+                attrib = {'ID': ref_ids[token_id], 'tokenIDs': token_id}
+                if antecedent is not None:
+                    attrib['target'] = ref_ids[antecedent]
+                E(entity, 'reference', **attrib)
+        chapter = []
+        for p in range(0, len(sentence_spans), self.paragraph_length):
+            paragraph = sentence_spans[p:p + self.paragraph_length]
+            E(textstructure, 'textspan', type='paragraph',
+              start=paragraph[0][0], end=paragraph[-1][1])
+            chapter.append(paragraph)
+            if len(chapter) == self.chapter_length:
+                E(textstructure, 'textspan', type='chapter',
+                  start=chapter[0][0][0], end=chapter[-1][-1][1])
+                chapter = []
+        if chapter:
+            E(textstructure, 'textspan', type='chapter',
+              start=chapter[0][0][0], end=chapter[-1][-1][1])
+        return etree.tostring(root, encoding='utf8', xml_declaration=True,
+                              pretty_print=True)
+
+
+def generate_corpus(**params):
+    """Return a synthetic TCF document. See :class:`CorpusGenerator`."""
+    return CorpusGenerator(**params).generate()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+            description='Generate a synthetic TCF corpus.')
+    arg_parser.add_argument('-n', '--sentences', type=int, default=1000)
+    arg_parser.add_argument('--vocabulary', type=int, default=500)
+    arg_parser.add_argument('--seed', type=int, default=0)
+    arg_parser.add_argument('-o', '--outfile', default='-')
+    args = arg_parser.parse_args()
+    data = generate_corpus(sentences=args.sentences,
+                           vocabulary=args.vocabulary, seed=args.seed)
+    if args.outfile == '-':
+        import sys
+        sys.stdout.buffer.write(data)
+    else:
+        with open(args.outfile, 'wb') as outfile:
+            outfile.write(data)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module implements a content-addressed on-disk cache for worker results.
+
+Entries are addressed by a hash over the input layers a worker reads and
+the options that influence its result. Running the same corpus again, e.g.
+with a different exporter downstream, then skips building the network.
+The cache is bounded in size. When it grows too large, the least recently
+used entries are removed.
+
+"""
+
+import os
+import json
+import logging
+import hashlib
+import tempfile
+
+from lxml import etree
+from tcflib import tcf
+
+#: Options that do not influence results and are not part of cache keys.
+UNCACHED_OPTIONS = ('cache', 'cache_size', 'metrics', 'profile')
+#: Bump this if the format of cached results changes.
+VERSION = 1
+
+
+def corpus_element(tree):
+    """Return the TextCorpus element of a TCF `tree`."""
+    return tree.getroot().find(tcf.P_TEXT + 'TextCorpus')
+
+
+def hash_layers(corpus, layers):
+    """
+    Return a hash over the input layers of `corpus`.
+
+    Layers that have been added to the corpus, but not serialized yet, are
+    serialized first. This is the case for all layers of corpora that were
+    not parsed, but built in Python.
+
+    :parameters:
+        - `corpus`: A :class:`tcflib.tcf.TextCorpus`.
+        - `layers`: The names of the layers to hash. Other layers do not
+          influence the hash.
+    :returns:
+        - The hex digest of the layers.
+
+    """
+    digest = hashlib.sha256()
+    digest.update((corpus.lang or '').encode('utf-8'))
+    for layer_elem in corpus_element(corpus.tree):
+        if etree.QName(layer_elem).localname in layers:
+            digest.update(etree.tostring(layer_elem))
+    return digest.hexdigest()
+
+
+def cached_options(options, uncached=UNCACHED_OPTIONS):
+    """
+    Return the options that are part of cache keys as a dict.
+
+    :parameters:
+        - `options`: The options of a worker.
+        - `uncached`: The names of the options that do not influence
+          results.
+
+    """
+    return {key: value for key, value in vars(options).items()
+            if key not in uncached}
+
+
+class ResultCache:
+    """
+    A size-bounded cache of byte strings in a directory.
+
+    Each entry is a file named after its key. Reading an entry updates its
+    modification time, which serves as the access time for LRU eviction.
+    Entries are written atomically, so several processes can share a cache
+    directory.
+
+    :parameters:
+        - `directory`: The cache directory. It is created if necessary.
+        - `max_size`: The maximum total size of all entries in bytes.
+
+    """
+
+    def __init__(self, directory, max_size=512 * 2 ** 20):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, *parts):
+        """
+        Return a key for `parts`.
+
+        Parts can be any JSON serializable values, e.g. input hashes and
+        option dicts. Dicts are serialized with sorted keys, so the order
+        of options does not matter.
+
+        """
+        data = json.dumps([VERSION] + list(parts), sort_keys=True)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key)
+
+    def get(self, key):
+        """Return the data stored for `key`, or None."""
+        path = self.path(key)
+        try:
+            with open(path, 'rb') as cachefile:
+                data = cachefile.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another process in the meantime.
+            logging.debug('Cache miss for {}.'.format(key))
+            return None
+        logging.debug('Cache hit for {}.'.format(key))
+        return data
+
+    def put(self, key, data):
+        """Store `data` for `key` and evict old entries if necessary."""
+        if len(data) > self.max_size:
+            logging.debug('Not caching {} bytes.'.format(len(data)))
+            return
+        fd, tmppath = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as tmpfile:
+            tmpfile.write(data)
+        os.replace(tmppath, self.path(key))
+        self.evict()
+
+    def get_json(self, key):
+        data = self.get(key)
+        if data is not None:
+            return json.loads(data.decode('utf-8'))
+
+    def put_json(self, key, value):
+        self.put(key, json.dumps(value).encode('utf-8'))
+
+    def get_elements(self, key):
+        """Return the list of XML elements stored for `key`, or None."""
+        data = self.get(key)
+        if data is not None:
+            parser = etree.XMLParser(remove_blank_text=True)
+            return list(etree.fromstring(data, parser=parser))
+
+    def put_elements(self, key, elements):
+        """Store a list of XML `elements` for `key`."""
+        data = b''.join([b'<elements>']
+                        + [etree.tostring(element) for element in elements]
+                        + [b'</elements>'])
+        self.put(key, data)
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits."""
+        entries = []
+        size = 0
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.tmp'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            size += stat.st_size
+        if size <= self.max_size:
+            return
+        entries.sort()
+        for mtime, entry_size, path in entries:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            logging.debug('Evicted {} from cache.'.format(path))
+            size -= entry_size
+            if size <= self.max_size:
+                break
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+This module implements a layer-selective, lazily parsed TCF text corpus.
+
+:class:`tcflib.tcf.TextCorpus` turns every annotation layer into Python
+objects while parsing. Most workers only need a few of them. A
+:class:`LazyTextCorpus` keeps the XML tree, but only builds the layers a
+worker declared, and only on first access. Exporters, which do not write
+the input back, can additionally drop unneeded layers while parsing.
+
+"""
+
+import logging
+from io import BytesIO
+
+from lxml import etree
+from tcflib import tcf
+
+#: Maps TCF layer element names to the attribute names used by
+#: :class:`tcflib.tcf.TextCorpus`.
+LAYER_ATTRIBUTES = {
+    'text': 'text',
+    'tokens': 'tokens',
+    'sentences': 'sentences',
+    'lemmas': 'lemmas',
+    'POStags': 'postags',
+    'depparsing': 'depparsing',
+    'namedEntities': 'namedentities',
+    'references': 'references',
+    'textstructure': 'textstructure',
+    'wsd': 'wsd',
+}
+
+#: Layers that do not form objects of their own, but annotate tokens. They
+#: are applied as soon as the tokens layer is built.
+TOKEN_LAYERS = ('lemmas', 'POStags', 'namedEntities', 'references', 'wsd')
+
+
+class LazyTextCorpus(tcf.TextCorpus):
+    """
+    A :class:`tcflib.tcf.TextCorpus` that builds annotation layers lazily.
+
+    :param input_data: The XML input.
+    :type input_data: bytes, str or None
+    :param layers: A list of layer names that may be accessed. If None, all
+                   layers are available.
+    :type layers: list or None
+    :param prune: Remove all other layers from the XML tree while parsing.
+                  Only use this if the input is not written back.
+    :type prune: bool
+
+    """
+
+    def __init__(self, input_data=None, *, layers=None, prune=False):
+        self._layer_elems = {}
+        self._loaded = set()
+        self.layers = list(layers) if layers is not None else None
+        if not input_data:
+            super().__init__(input_data, layers=[])
+            return
+        self.new_layers = []
+        if isinstance(input_data, str):
+            input_data = input_data.encode('utf-8')
+        logging.debug('Parsing input data.')
+        if prune and self.layers is not None:
+            self._tree = self._parse_pruned(input_data)
+        else:
+            parser = etree.XMLParser(remove_blank_text=True)
+            root = etree.fromstring(input_data, parser=parser)
+            self._tree = etree.ElementTree(root)
+        corpus_elem = self._tree.xpath('/data:D-Spin/text:TextCorpus',
+                                       namespaces=tcf.NS)[0]
+        self.lang = corpus_elem.get('lang')
+        for layer_elem in corpus_elem:
+            tag = etree.QName(layer_elem).localname
+            if self.layers is None or tag in self.layers:
+                self._layer_elems[tag] = layer_elem
+
+    def _parse_pruned(self, input_data):
+        """
+        Parse input data, discarding all layers that were not requested.
+
+        Each unneeded layer is removed from the tree as soon as its end tag
+        has been parsed, so the memory it occupies is freed right away.
+
+        """
+        pruned = [tcf.P_TEXT + tag for tag in LAYER_ATTRIBUTES
+                  if tag not in self.layers]
+        # The graph layer is not known to tcflib, but exporters select it.
+        if 'graph' not in self.layers:
+            pruned.append(tcf.P_TEXT + 'graph')
+        context = etree.iterparse(BytesIO(input_data), events=('end',),
+                                  tag=pruned, remove_blank_text=True)
+        root = None
+        for event, elem in context:
+            parent = elem.getparent()
+            if etree.QName(parent).localname != 'TextCorpus':
+                continue
+            logging.debug('Skipping layer "{}".'.format(
+                    etree.QName(elem).localname))
+            elem.clear()
+            parent.remove(elem)
+            root = parent.getroottree()
+        if root is None:
+            root = context.root.getroottree()
+        return root
+
+    def __getattr__(self, name):
+        # Only called if regular attribute lookup fails, i.e. if the layer
+        # has not been built yet.
+        if name.startswith('_') or name == 'layers':
+            raise AttributeError(name)
+        for tag, attribute in LAYER_ATTRIBUTES.items():
+            if attribute == name and tag in self._layer_elems:
+                self._load_layer(tag)
+                return self.__dict__[name]
+        raise AttributeError("'{}' object has no attribute '{}'".format(
+                type(self).__name__, name))
+
+    def _load_layer(self, tag):
+        if tag in self._loaded:
+            return
+        self._loaded.add(tag)
+        logging.debug('Reading layer "{}".'.format(tag))
+        layer_elem = self._layer_elems[tag]
+        reader = getattr(self, '_read_{}'.format(tag.lower()))
+        reader(layer_elem)
+        # Layers read from the input must not be serialized again.
+        attribute = LAYER_ATTRIBUTES[tag]
+        if attribute in self.new_layers:
+            self.new_layers.remove(attribute)
+        if tag == 'tokens':
+            for token_tag in TOKEN_LAYERS:
+                if token_tag in self._layer_elems:
+                    self._load_layer(token_tag)
+
+    def _read_text(self, layer_elem):
+        self.add_layer(tcf.Text(layer_elem.text))
+
+    def _read_tokens(self, layer_elem):
+        self.add_layer(tcf.Tokens())
+        tokens = self.__dict__['tokens']
+        for token_elem in layer_elem:
+            tokens[token_elem.get('ID')] = tcf.Token(token_elem.text)
+
+    def _read_sentences(self, layer_elem):
+        tokens = self.tokens
+        self.add_layer(tcf.Sentences())
+        for sentence_elem in layer_elem:
+            sentence = tcf.Sentence()
+            sentence.tokens = [tokens[key] for key in
+                               sentence_elem.get('tokenIDs').split()]
+            self.sentences[sentence_elem.get('ID')] = sentence
+
+    def _read_lemmas(self, layer_elem):
+        tokens = self.tokens
+        self.add_layer(tcf.Lemmas())
+        for lemma_elem in layer_elem:
+            for token_id in lemma_elem.get('tokenIDs').split():
+                tokens[token_id].lemma = lemma_elem.text
+
+    def _read_postags(self, layer_elem):
+        tokens = self.tokens
+        self.add_layer(tcf.POStags(layer_elem.get('tagset')))
+        for tag_elem in layer_elem:
+            for token_id in tag_elem.get('tokenIDs').split():
+                tokens[token_id].tag = tag_elem.text
+
+    def _read_depparsing(self, layer_elem):
+        tokens = self.tokens
+        self.add_layer(tcf.DepParsing(
+                tagset=layer_elem.get('tagset'),
+                emptytoks=layer_elem.get('emptytoks') == 'true',
+                multigovs=layer_elem.get('multigovs') == 'true'))
+        for parse_elem in layer_elem:
+            parse = tcf.DepParse()
+            for dep_elem in parse_elem:
+                if 'govIDs' in dep_elem.attrib:
+                    gov_tokens = [tokens[token_id] for token_id
+                                  in dep_elem.get('govIDs').split()]
+                else:
+                    gov_tokens = None
+                if 'depIDs' in dep_elem.attrib:
+                    dep_tokens = [tokens[token_id] for token_id
+                                  in dep_elem.get('depIDs').split()]
+                else:
+                    dep_tokens = None
+                parse.append(tcf.Dependency(func=dep_elem.get('func'),
+                                            gov_tokens=gov_tokens,
+                                            dep_tokens=dep_tokens))
+            self.depparsing.append(parse)
+
+    def _read_namedentities(self, layer_elem):
+        tokens = self.tokens
+        self.add_layer(tcf.NamedEntities(layer_elem.get('type')))
+        for entity_elem in layer_elem:
+            entity = tcf.NamedEntity(class_=entity_elem.get('class'))
+            entity.tokens = [tokens[token_id] for token_id
+                             in entity_elem.get('tokenIDs').split()]
+            self.namedentities.append(entity)
+
+    def _read_references(self, layer_elem):
+        tokens = self.tokens
+        self.add_layer(tcf.References(
+                typetagset=layer_elem.get('typetagset'),
+                reltagset=layer_elem.get('reltagset'),
+                extrefs=layer_elem.get('extrefs')))
+        for entity_elem in layer_elem:
+            entity = tcf.Entity()
+            # Collect references, as referenced References may not
+            # exist yet.
+            targets = {}
+            extref_elem = entity_elem.find(tcf.P_TEXT + 'extref')
+            if extref_elem is not None:
+                entity.extref = extref_elem.get('refid')
+            for ref_elem in entity_elem.findall(tcf.P_TEXT + 'reference'):
+                reference = tcf.Reference()
+                reference.id = ref_elem.get('ID')
+                for token_id in ref_elem.get('tokenIDs').split():
+                    reference.tokens.append(tokens[token_id])
+                if 'target' in ref_elem.attrib:
+                    targets[reference.id] = ref_elem.get('target')
+                entity.append(reference)
+            for source, target in targets.items():
+                entity[source].target = entity[target]
+            self.references.append(entity)
+
+    def _read_textstructure(self, layer_elem):
+        tokens = self.tokens
+        # Look up span starts by position instead of searching the key list
+        # for every span.
+        keys = list(tokens.keys())
+        positions = {key: i for i, key in enumerate(keys)}
+        self.add_layer(tcf.TextStructure())
+        for span_elem in layer_elem:
+            if not 'start' in span_elem.attrib:
+                # The TCF example contains textspans with no start or end
+                # attribute. The meaning of those is unclear, we skip them
+                # here.
+                continue
+            span = tcf.TextSpan()
+            if 'type' in span_elem.attrib:
+                span.type = span_elem.get('type')
+            span.tokens = []
+            end = span_elem.get('end')
+            for key in keys[positions[span_elem.get('start')]:]:
+                span.tokens.append(tokens[key])
+                if key == end:
+                    break
+            self.textstructure.append(span)
+
+    def _read_wsd(self, layer_elem):
+        tokens = self.tokens
+        self.add_layer(tcf.Wsd(layer_elem.get('src')))
+        for ws_elem in layer_elem:
+            senses = ws_elem.get('lexunits').split()
+            for token_id in ws_elem.get('tokenIDs').split():
+                tokens[token_id].wordsenses = senses
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module implements counting of integer pairs in external memory.
+
+Cooccurrence edge sets can outgrow the available memory on large corpora.
+A :class:`SpillingPairCounter` buffers pairs in a fixed-size chunk. Full
+chunks are sorted, run-length encoded and spilled to a temporary file.
+Counting the pairs then k-way merges all spilled runs, so that memory use
+is bounded by the chunk size, not by the number of distinct pairs. At most
+`max_runs` runs are merged at once, so that the number of open files and
+read buffers stays bounded as well. If there are more runs, they are merged
+in several passes.
+
+"""
+
+import os
+import heapq
+import logging
+import tempfile
+from array import array
+from itertools import groupby
+
+#: Estimated memory per buffered pair, including the temporary list that
+#: sorting creates.
+BYTES_PER_PAIR = 64
+#: The number of (key, count) entries read from a run at a time.
+READ_BLOCK = 8192
+#: The maximum number of runs merged at once. Each needs a read buffer of
+#: 16 * READ_BLOCK bytes.
+MAX_RUNS = 64
+MAX_ID = 2 ** 32
+
+
+class SpillingPairCounter:
+    """
+    Counts pairs of integers with a bounded memory budget.
+
+    Pairs are encoded as a single 64 bit key, so both integers must be
+    non-negative and smaller than 2**32.
+
+    :parameters:
+        - `memory_budget`: The memory budget for the buffer in bytes.
+        - `tmpdir`: The directory for spilled runs. Defaults to the system
+          temporary directory.
+        - `max_runs`: The maximum number of runs merged at once.
+
+    """
+
+    def __init__(self, memory_budget=256 * 2 ** 20, tmpdir=None,
+                 max_runs=MAX_RUNS):
+        self.chunk_size = max(1024, memory_budget // BYTES_PER_PAIR)
+        self.tmpdir = tmpdir
+        self.max_runs = max(2, max_runs)
+        self.buffer = array('Q')
+        self.runs = []
+        self.n_pairs = 0
+        #: The number of runs spilled from the buffer.
+        self.n_spilled = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add(self, a, b):
+        """Count the pair `(a, b)` once."""
+        self.buffer.append(a << 32 | b)
+        if len(self.buffer) >= self.chunk_size:
+            self.spill()
+
+    def encode_buffer(self):
+        """Sort the buffer and return it as flat (key, count) entries."""
+        encoded = array('Q')
+        for key, group in groupby(sorted(self.buffer)):
+            encoded.append(key)
+            encoded.append(sum(1 for _ in group))
+        self.n_pairs += len(self.buffer)
+        self.buffer = array('Q')
+        return encoded
+
+    def spill(self):
+        """Write the current buffer to disk as a sorted run."""
+        if not self.buffer:
+            return
+        encoded = self.encode_buffer()
+        self.runs.append(self.write_run([encoded]))
+        self.n_spilled += 1
+        logging.debug('Spilled run {} with {} distinct pairs.'.format(
+                self.n_spilled, len(encoded) // 2))
+
+    def write_run(self, blocks):
+        """Write blocks of flat (key, count) entries to a new run file."""
+        fd, path = tempfile.mkstemp(prefix='tcfnetworks-', suffix='.run',
+                                    dir=self.tmpdir)
+        with os.fdopen(fd, 'wb') as runfile:
+            for block in blocks:
+                block.tofile(runfile)
+        return path
+
+    def merge_runs(self, paths):
+        """Yield the summed up (key, count) entries of the runs at `paths`."""
+        runs = [self.read_run(path) for path in paths]
+        merged = heapq.merge(*runs) if len(runs) > 1 else runs[0]
+        for key, group in groupby(merged, key=lambda entry: entry[0]):
+            yield key, sum(count for _, count in group)
+
+    def merge_pass(self):
+        """Merge the oldest `max_runs` runs into a single run."""
+        paths = self.runs[:self.max_runs]
+
+        def blocks():
+            block = array('Q')
+            for key, count in self.merge_runs(paths):
+                block.append(key)
+                block.append(count)
+                if len(block) >= 2 * READ_BLOCK:
+                    yield block
+                    block = array('Q')
+            yield block
+
+        path = self.write_run(blocks())
+        for merged_path in paths:
+            os.remove(merged_path)
+        self.runs = self.runs[self.max_runs:] + [path]
+        logging.debug('Merged {} runs, {} left.'.format(len(paths),
+                                                        len(self.runs)))
+
+    def read_run(self, path):
+        with open(path, 'rb') as runfile:
+            while True:
+                block = array('Q')
+                try:
+                    block.fromfile(runfile, 2 * READ_BLOCK)
+                except EOFError:
+                    # The last block is shorter, but has been read.
+                    pass
+                if not block:
+                    return
+                for i in range(0, len(block), 2):
+                    yield block[i], block[i + 1]
+
+    def __iter__(self):
+        """
+        Yield `(a, b, count)` triples, sorted by `a` and `b`.
+
+        If nothing has been spilled yet, the buffer is counted in memory.
+        Otherwise the buffer is spilled as well and all runs are merged.
+        If there are more than `max_runs` runs, they are first merged into
+        fewer runs in several passes.
+
+        """
+        if not self.runs:
+            encoded = self.encode_buffer()
+            entries = zip(encoded[::2], encoded[1::2])
+        else:
+            self.spill()
+            while len(self.runs) > self.max_runs:
+                self.merge_pass()
+            entries = self.merge_runs(self.runs)
+        mask = MAX_ID - 1
+        for key, count in entries:
+            yield key >> 32, key & mask, count
+
+    def close(self):
+        """Remove all spilled runs."""
+        for path in self.runs:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.runs = []
+        self.buffer = array('Q')
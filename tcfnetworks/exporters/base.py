@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This exporter base class implements layer-selective input parsing.
+
+This class does not work as a worker by itself, but rather works as a base class
+for implementing exporters.
+
+"""
+
+import sys
+import logging
+
+from tcflib import tcf
+from tcflib.service import ExportingWorker
+
+from tcfnetworks.corpus import LazyTextCorpus
+from tcfnetworks.metrics import InstrumentedWorker
+
+
+class GraphExportingWorker(InstrumentedWorker, ExportingWorker):
+
+    __options__ = InstrumentedWorker.__options__.copy()
+    __options__.update({
+        'graph': '',  # the configuration of the graph layer to export
+    })
+
+    #: The TCF layers the exporter reads. All other layers are dropped while
+    #: parsing, since exporters do not write their input back.
+    layers = ['graph']
+    #: The file name extension of the output format.
+    extension = 'xml'
+
+    def setup(self, input_data):
+        if isinstance(input_data, tcf.TextCorpus):
+            self.corpus = input_data
+        else:
+            with self.metrics.stage('parse'):
+                self.corpus = LazyTextCorpus(input_data, layers=self.layers,
+                                             prune=True)
+
+    def graph_element(self):
+        """
+        Return the graph layer element to export.
+
+        If the corpus has several graph layers, e.g. from a sweep, the
+        `graph` option selects one by its configuration. By default, the
+        first graph layer is used.
+
+        """
+        graphs = self.corpus.tree.xpath(
+                '//text:graph[$graph = "" or @config = $graph]',
+                graph=self.options.graph, namespaces=tcf.NS)
+        if not graphs:
+            logging.error('No graph layer "{}".'.format(self.options.graph))
+            sys.exit(-1)
+        return graphs[0]
+
+    def process(self, input_data):
+        self.setup(input_data)
+        with self.metrics.stage('serialization'):
+            return self.export()
@@ -32,6 +32,8 @@ from tcfnetworks.exporters.d3_json import JSONWorker
 
 class D3HTMLWorker(JSONWorker):
 
+    extension = 'html'
+
     def export(self):
         data = super().export()
         d3 = (Path(__file__).parent / 'data' / 'd3.v3.min.js').read_text()
@@ -24,17 +24,33 @@ JSON exporter for TCF graphs.
 import json
 
 from tcflib import tcf
-from tcflib.service import ExportingWorker, run_as_cli
+from tcflib.service import run_as_cli
 
+from tcfnetworks.exporters.base import GraphExportingWorker
+from tcfnetworks.utils import decode_token_runs
 
-class JSONWorker(ExportingWorker):
 
-    def _node2json(self, node):
+class JSONWorker(GraphExportingWorker):
+
+    layers = ['graph', 'sentences', 'tokens']
+    extension = 'json'
+
+    def _node2json(self, node, token_ids):
+        if "tokenIDs" in node.attrib:
+            tokens = node.get('tokenIDs').split()
+        elif "tokenRuns" in node.attrib:
+            tokens = [token_ids[i] for i
+                      in decode_token_runs(node.get('tokenRuns'))]
+        else:
+            # Only the count of tokens is known.
+            tokens = []
         node_data = {
             "id": node.get('ID'),
             "name": node.text,
-            "tokens": node.get('tokenIDs').split()
+            "tokens": tokens
         }
+        if "count" in node.attrib:
+            node_data["count"] = int(node.get('count'))
         if "class" in node.attrib:
             node_data["class"] = node.get('class')
         return node_data
@@ -61,16 +77,16 @@ class JSONWorker(ExportingWorker):
 
     def export(self):
         input_tree = self.corpus.tree
-        nodes = input_tree.xpath("//text:graph/text:nodes/text:node",
-                                 namespaces=tcf.NS)
-        edges = input_tree.xpath("//text:graph/text:edges/text:edge",
-                                 namespaces=tcf.NS)
+        graph = self.graph_element()
+        nodes = graph.xpath("text:nodes/text:node", namespaces=tcf.NS)
+        edges = graph.xpath("text:edges/text:edge", namespaces=tcf.NS)
         sentences = input_tree.xpath("//text:sentences/text:sentence",
                                      namespaces=tcf.NS)
         tokens = input_tree.xpath("//text:tokens/text:token",
                                   namespaces=tcf.NS)
         tokens_map = {token.get("ID"): token.text for token in tokens}
-        nodes_data = [self._node2json(node) for node in nodes]
+        token_ids = [token.get("ID") for token in tokens]
+        nodes_data = [self._node2json(node, token_ids) for node in nodes]
         nodes_map = {node["id"]: i for i, node in enumerate(nodes_data)}
         links_data = [self._edge2json(edge, nodes_map) for edge in edges]
         text_data = [self._sentence2json(sentence, tokens_map)
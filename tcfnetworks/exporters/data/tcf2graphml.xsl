@@ -16,28 +16,34 @@
     indent="yes" />
 
   <xsl:strip-space elements="*" />
+
+  <!-- The configuration of the graph layer to export. By default, the first
+       graph layer is used. -->
+  <xsl:param name="graph" select="''" />
+  <xsl:variable name="g"
+    select="(//tcf:graph[$graph = '' or @config = $graph])[1]" />
   
   <xsl:template match="/">
     <graphml>
       <key id="label" for="node" attr.name="label" attr.type="string" />
-      <xsl:if test="//tcf:graph/tcf:nodes/tcf:node[@class]">
+      <xsl:if test="$g/tcf:nodes/tcf:node[@class]">
         <key id="class" for="node" attr.name="class" attr.type="string" />
       </xsl:if>
-      <xsl:if test="//tcf:graph/tcf:nodes/tcf:node[@type]">
+      <xsl:if test="$g/tcf:nodes/tcf:node[@type]">
         <key id="type" for="node" attr.name="type" attr.type="string" />
       </xsl:if>
-      <xsl:if test="//tcf:graph/tcf:nodes/tcf:node[@tokenIDs]">
+      <xsl:if test="$g/tcf:nodes/tcf:node[@count or @tokenIDs]">
         <key id="count" for="node" attr.name="count" attr.type="int" />
       </xsl:if>
-      <xsl:if test="//tcf:graph/tcf:edges/tcf:edge[@label]">
+      <xsl:if test="$g/tcf:edges/tcf:edge[@label]">
         <key id="weight" for="edge" attr.name="label" attr.type="string" />
       </xsl:if>
-      <xsl:if test="//tcf:graph/tcf:edges/tcf:edge[@weight]">
+      <xsl:if test="$g/tcf:edges/tcf:edge[@weight]">
         <key id="weight" for="edge" attr.name="weight" attr.type="float" />
       </xsl:if>
       <graph edgedefault="undirected">
-        <xsl:apply-templates select="//tcf:graph/tcf:nodes/tcf:node"/>
-        <xsl:apply-templates select="//tcf:graph/tcf:edges/tcf:edge"/>
+        <xsl:apply-templates select="$g/tcf:nodes/tcf:node"/>
+        <xsl:apply-templates select="$g/tcf:edges/tcf:edge"/>
       </graph>
     </graphml>
   </xsl:template>
@@ -51,9 +57,16 @@
       <xsl:if test="@type">
         <data key="type"><xsl:value-of select="@type" /></data>
       </xsl:if>
-      <xsl:if test="@tokenIDs">
-        <data key="count"><xsl:value-of select="count(str:tokenize(@tokenIDs))" /></data>
-      </xsl:if>
+      <!-- Use the count of the annotator if present, so that token IDs need
+           not be tokenized. -->
+      <xsl:choose>
+        <xsl:when test="@count">
+          <data key="count"><xsl:value-of select="@count" /></data>
+        </xsl:when>
+        <xsl:when test="@tokenIDs">
+          <data key="count"><xsl:value-of select="count(str:tokenize(@tokenIDs))" /></data>
+        </xsl:when>
+      </xsl:choose>
     </node>
   </xsl:template>
 
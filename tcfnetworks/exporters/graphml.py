@@ -25,10 +25,14 @@ import os.path
 
 from lxml import etree
 from tcflib import tcf
-from tcflib.service import ExportingWorker, run_as_cli
+from tcflib.service import run_as_cli
 
+from tcfnetworks.exporters.base import GraphExportingWorker
 
-class GraphMLWorker(ExportingWorker):
+
+class GraphMLWorker(GraphExportingWorker):
+
+    extension = 'graphml'
 
     def export(self):
         input_tree = self.corpus.tree
@@ -36,7 +40,10 @@ class GraphMLWorker(ExportingWorker):
                                  'data', 'tcf2graphml.xsl')
         xslt_tree = etree.parse(xslt_file)
         transform = etree.XSLT(xslt_tree)
-        output_tree = transform(input_tree)
+        # Fail early if the selected graph layer does not exist.
+        self.graph_element()
+        output_tree = transform(input_tree,
+                                graph=etree.XSLT.strparam(self.options.graph))
         return etree.tostring(output_tree, encoding='utf8', pretty_print=True)
 
 
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module implements opt-in instrumentation for workers.
+
+A :class:`Metrics` object records wall time and memory use per processing
+stage, plus arbitrary counters. Workers that are not instrumented use
+:data:`NULL_METRICS` instead, whose methods do nothing, so instrumentation
+points cost next to nothing when disabled.
+
+Counters in hot loops should be accumulated in local variables and added
+once per call, rather than calling :meth:`Metrics.count` per iteration.
+
+"""
+
+import sys
+import json
+import time
+import cProfile
+import logging
+import tracemalloc
+from collections import OrderedDict, Counter
+from contextlib import contextmanager, nullcontext
+try:
+    import resource
+except ImportError:
+    # Not available on Windows.
+    resource = None
+
+
+def peak_rss():
+    """
+    Return the peak resident set size of the process in bytes.
+
+    Unlike :mod:`tracemalloc`, this includes the memory allocated by C
+    libraries like lxml and igraph. It is a high-water mark over the life
+    of the process. Returns 0 where it is not available.
+
+    On Linux, it is read from `/proc`, since the peak reported by
+    :func:`resource.getrusage` carries over from the parent of a newly
+    started program.
+
+    """
+    try:
+        with open('/proc/self/status', 'rb') as status:
+            for line in status:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return 0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class Metrics:
+    """
+    Collects stage timings and counters.
+
+    Stages can be nested and entered several times. Times of repeated
+    stages are summed up, memory peaks are the maximum over all calls.
+
+    Memory is recorded in three ways per stage:
+
+    - `heap_peak` is the peak of Python heap allocations as traced by
+      :mod:`tracemalloc`. It does not include memory that C libraries like
+      lxml and igraph allocate, which is most of the memory of parsing,
+      serialization and graph building.
+    - `peak_rss` is the peak resident set size of the process at the end of
+      the stage, see :func:`peak_rss`. It includes all allocations, but it
+      cannot be reset, so it includes all previous stages as well.
+    - `rss_growth` is by how much the stage raised `peak_rss`, i.e. the
+      memory the stage needed beyond the previous peak.
+
+    """
+
+    enabled = True
+
+    def __init__(self, trace_memory=True):
+        self.stages = OrderedDict()
+        self.counters = Counter()
+        self.trace_memory = trace_memory
+        self._stack = []
+        # Only stop tracing on close if it was started here.
+        self._tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._tracing:
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        if self.trace_memory:
+            if self._stack:
+                # Keep the peak of the enclosing stage before resetting it.
+                peak = tracemalloc.get_traced_memory()[1]
+                self._stack[-1][1] = max(self._stack[-1][1], peak)
+            tracemalloc.reset_peak()
+        entry = [time.perf_counter(), 0, peak_rss()]
+        self._stack.append(entry)
+        try:
+            yield self
+        finally:
+            self._stack.pop()
+            seconds = time.perf_counter() - entry[0]
+            rss = peak_rss()
+            peak = 0
+            if self.trace_memory:
+                peak = max(entry[1], tracemalloc.get_traced_memory()[1])
+                if self._stack:
+                    self._stack[-1][1] = max(self._stack[-1][1], peak)
+            stage = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0,
+                                                  'heap_peak': 0,
+                                                  'peak_rss': 0,
+                                                  'rss_growth': 0})
+            stage['calls'] += 1
+            stage['seconds'] += seconds
+            stage['heap_peak'] = max(stage['heap_peak'], peak)
+            stage['peak_rss'] = max(stage['peak_rss'], rss)
+            stage['rss_growth'] += rss - entry[2]
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def as_dict(self):
+        return {'stages': self.stages, 'counters': dict(self.counters)}
+
+    def close(self):
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+
+class NullMetrics:
+    """A stand-in for :class:`Metrics` that records nothing."""
+
+    enabled = False
+
+    def stage(self, name):
+        return nullcontext(self)
+
+    def count(self, name, n=1):
+        pass
+
+    def as_dict(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+NULL_METRICS = NullMetrics()
+
+
+class InstrumentedWorker:
+    """
+    Mixin that adds opt-in instrumentation to a worker.
+
+    It expects the worker options `metrics` and `profile`. If `metrics` is
+    set, stage timings and counters are written as JSON to that path, or
+    to standard error for `-`. If `profile` is set, a cProfile dump of the
+    run is written to that path.
+
+    Workers implement :meth:`process` instead of overriding :meth:`run`.
+
+    """
+
+    __options__ = {
+        'metrics': '',
+        'profile': '',
+    }
+
+    metrics = NULL_METRICS
+
+    def run(self, input_data):
+        if self.options.metrics:
+            self.metrics = Metrics()
+        profiler = None
+        if self.options.profile:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            with self.metrics.stage('total'):
+                output = self.process(input_data)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                profiler.dump_stats(self.options.profile)
+            if self.metrics.enabled:
+                self.write_metrics()
+                self.metrics.close()
+                self.metrics = NULL_METRICS
+        return output
+
+    def process(self, input_data):
+        """Do the actual work of :meth:`run`."""
+        raise NotImplementedError
+
+    def write_metrics(self):
+        data = OrderedDict(worker=type(self).__name__)
+        data.update(self.metrics.as_dict())
+        output = json.dumps(data, indent=2)
+        if self.options.metrics == '-':
+            print(output, file=sys.stderr)
+        else:
+            with open(self.options.metrics, 'w') as outfile:
+                outfile.write(output)
+        logging.debug('Wrote metrics to "{}".'.format(self.options.metrics))
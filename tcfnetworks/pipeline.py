@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module chains an annotator and exporters in a single process.
+
+On the command line, workers are chained by serializing the corpus to XML,
+piping it, and parsing it again in the next process::
+
+    annotators/cooccurrence.py < in.xml | exporters/graphml.py > out.graphml
+
+A :class:`Pipeline` hands the in-memory corpus, including the graph layer,
+directly from the annotator to the exporters::
+
+    pipeline = Pipeline(CooccurrenceWorker(window=[2]), GraphMLWorker())
+    for graphml, in pipeline.run_many(documents):
+        ...
+
+The same pipeline is available from the command line::
+
+    python -m tcfnetworks.pipeline cooccurrence graphml -O window=2 \\
+        -i in.xml -d output/
+
+"""
+
+import os
+import sys
+import argparse
+import logging
+
+from tcflib import tcf
+from tcflib.service import Read
+
+from tcfnetworks.workers import (ANNOTATORS, EXPORTERS, get_worker_class,
+                                 parse_options)
+
+
+#: Options that name output files. Each worker gets its own file.
+PATH_OPTIONS = ('metrics', 'profile')
+
+
+def worker_path(path, name):
+    """
+    Return the path of the output file `path` for the worker `name`.
+
+    The name is inserted before the extension, e.g. `metrics.json` becomes
+    `metrics.graphml.json`. Standard error, `-`, and unset options are kept.
+
+    """
+    if path in ('', '-'):
+        return path
+    root, extension = os.path.splitext(path)
+    return '{}.{}{}'.format(root, name, extension)
+
+
+class Pipeline:
+    """
+    A chain of an annotator and any number of exporters.
+
+    :parameters:
+        - `annotator`: A worker that adds annotations, e.g. a
+          :class:`TokenTestingWorker <tcfnetworks.annotators.base.TokenTestingWorker>`
+          subclass instance.
+        - `exporters`: Workers that export the annotated corpus. All of them
+          get the same corpus object.
+
+    """
+
+    def __init__(self, annotator, *exporters):
+        self.annotator = annotator
+        self.exporters = list(exporters)
+
+    def __ror__(self, input_data):
+        return self.run(input_data)
+
+    @classmethod
+    def from_names(cls, annotator, exporters=(), options=()):
+        """
+        Create a pipeline from registered worker names.
+
+        Each option is passed to every worker in the pipeline that supports
+        it. Each worker writes its own metrics and profile, see
+        :func:`worker_path`.
+
+        :parameters:
+            - `annotator`: The name of the annotator.
+            - `exporters`: The names of the exporters.
+            - `options`: An iterable of `(key, value)` string pairs.
+        :raises KeyError: if a worker name is not registered.
+        :raises ValueError: if no worker in the pipeline supports an
+            option.
+
+        """
+        options = list(options)
+        worker_classes = [get_worker_class(name)
+                          for name in [annotator] + list(exporters)]
+        unknown = sorted({key for key, value in options
+                          if not any(key in worker_class.__options__
+                                     for worker_class in worker_classes)})
+        if unknown:
+            raise ValueError('Unknown option{} {}.'.format(
+                    's' if len(unknown) > 1 else '',
+                    ', '.join('"{}"'.format(key) for key in unknown)))
+        names = [annotator] + list(exporters)
+        workers = []
+        for i, (name, worker_class) in enumerate(zip(names, worker_classes)):
+            if names.count(name) > 1:
+                name = '{}{}'.format(name, i)
+            worker_options = parse_options(worker_class,
+                    [(key, worker_path(value, name)
+                      if key in PATH_OPTIONS and len(names) > 1 else value)
+                     for key, value in options
+                     if key in worker_class.__options__])
+            workers.append(worker_class(**worker_options))
+        return cls(*workers)
+
+    def run(self, input_data):
+        """
+        Run the pipeline on a single document.
+
+        :parameters:
+            - `input_data`: A TCF document as bytes or a
+              :class:`tcflib.tcf.TextCorpus`.
+        :returns:
+            - A list with one output per exporter. If the pipeline has no
+              exporters, the annotated corpus.
+
+        """
+        corpus = self.annotator.run(input_data)
+        if not self.exporters:
+            return corpus
+        outputs = [exporter.run(corpus) for exporter in self.exporters]
+        # Do not keep the corpus alive until the next document.
+        for worker in [self.annotator] + self.exporters:
+            worker.corpus = None
+        return outputs
+
+    def run_many(self, documents):
+        """
+        Run the pipeline on many documents.
+
+        :parameters:
+            - `documents`: An iterable of TCF documents.
+        :returns:
+            - yields the result of :meth:`run` for each document.
+
+        """
+        for i, input_data in enumerate(documents, start=1):
+            logging.debug('Running pipeline on document {}.'.format(i))
+            yield self.run(input_data)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+            description='Run an annotator and exporters in one process.')
+    arg_parser.add_argument('-v', '--verbose', action='store_true')
+    arg_parser.add_argument('annotator', choices=ANNOTATORS)
+    arg_parser.add_argument('exporters', nargs='*',
+                            help='Exporters to run on the annotated corpus: '
+                                 '{}.'.format(', '.join(EXPORTERS)))
+    arg_parser.add_argument('-O', '--option', action='append', default=[],
+                            metavar='KEY=VALUE',
+                            help='A worker option. Can be given several '
+                                 'times, e.g. for list options.')
+    arg_parser.add_argument('-i', '--infiles', nargs='*', default=[],
+                            help='Input files (default: standard input).')
+    arg_parser.add_argument('-d', '--outdir', default='',
+                            help='Directory to write one output file per '
+                                 'input file and exporter to (default: '
+                                 'standard output).')
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose
+                        else logging.ERROR)
+    options = []
+    for option in args.option:
+        key, sep, value = option.partition('=')
+        if not sep:
+            arg_parser.error('Option "{}" is not of the form '
+                             'KEY=VALUE.'.format(option))
+        options.append((key, value))
+    for name in args.exporters:
+        if name not in EXPORTERS:
+            arg_parser.error('No exporter "{}".'.format(name))
+    try:
+        pipeline = Pipeline.from_names(args.annotator, args.exporters,
+                                       options)
+    except ValueError as e:
+        arg_parser.error(str(e))
+    if args.infiles:
+        documents = (Read(infile) for infile in args.infiles)
+        names = [os.path.splitext(os.path.basename(infile))[0]
+                 for infile in args.infiles]
+    else:
+        documents = [sys.stdin.buffer.read()]
+        names = ['stdin']
+    extensions = [getattr(exporter, 'extension', 'out')
+                  for exporter in pipeline.exporters] or ['xml']
+    if args.outdir:
+        os.makedirs(args.outdir, exist_ok=True)
+    for name, outputs in zip(names, pipeline.run_many(documents)):
+        if not pipeline.exporters:
+            outputs = [outputs]
+        for extension, output in zip(extensions, outputs):
+            output = tcf.serialize(output)
+            if args.outdir:
+                path = os.path.join(args.outdir,
+                                    '{}.{}'.format(name, extension))
+                with open(path, 'wb') as outfile:
+                    outfile.write(output)
+            else:
+                sys.stdout.buffer.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module implements one-mode projections of bipartite graphs.
+
+A bipartite graph, like the verb–noun graphs of the dependency annotator,
+is represented as a sparse biadjacency matrix `B`, with one row per node of
+the first mode (e.g. verbs) and one column per node of the second mode
+(e.g. nouns). The projection onto the second mode is `BᵀWB`, the one onto
+the first mode `BWBᵀ`, where the diagonal matrix `W` weights the shared
+neighbours:
+
+- `count`: Each shared neighbour counts 1.
+- `newman`: A shared neighbour with degree k counts 1 / (k - 1), as in
+  Newman, M. E. J. 2001. „Scientific collaboration networks. II.“ Physical
+  Review E 64: 016132.
+- `hyperbolic`: A shared neighbour with degree k counts 1 / k.
+
+"""
+
+import numpy as np
+from scipy import sparse
+from tcflib import tcf
+
+from tcfnetworks.backbone import topk
+from tcfnetworks.utils import edge_arrays
+
+WEIGHTINGS = ('count', 'newman', 'hyperbolic')
+
+
+def biadjacency_matrix(edges, types):
+    """
+    Return the binary biadjacency matrix of a bipartite graph.
+
+    :parameters:
+        - `edges`: An integer array of shape `(E, 2)`. Edges within a mode
+          are ignored.
+        - `types`: A boolean array of shape `(N,)`, False for nodes of the
+          first mode and True for nodes of the second one.
+    :returns:
+        - A :class:`scipy.sparse.csr_matrix` and the node indices of its
+          rows and columns.
+
+    """
+    row_nodes = np.flatnonzero(~types)
+    col_nodes = np.flatnonzero(types)
+    index = np.empty(len(types), dtype=np.intp)
+    index[row_nodes] = np.arange(len(row_nodes))
+    index[col_nodes] = np.arange(len(col_nodes))
+    # Orient all edges from the first to the second mode.
+    swap = types[edges[:, 0]]
+    first = np.where(swap, edges[:, 1], edges[:, 0])
+    second = np.where(swap, edges[:, 0], edges[:, 1])
+    valid = ~types[first] & types[second]
+    rows, cols = index[first[valid]], index[second[valid]]
+    matrix = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)),
+                               shape=(len(row_nodes), len(col_nodes)))
+    # Multiple edges between two nodes count once.
+    matrix.data[:] = 1
+    return matrix, row_nodes, col_nodes
+
+
+def project(matrix, weighting='count'):
+    """
+    Project a biadjacency matrix onto its columns.
+
+    :parameters:
+        - `matrix`: A binary :class:`scipy.sparse.csr_matrix`.
+        - `weighting`: One of :data:`WEIGHTINGS`.
+    :returns:
+        - An integer array of shape `(E, 2)` of column pairs and an array of
+          shape `(E,)` of their weights. Each pair is listed once. Weights
+          are integers for `count`, and floats otherwise.
+
+    """
+    degree = np.asarray(matrix.sum(axis=1)).ravel()
+    with np.errstate(divide='ignore'):
+        if weighting == 'newman':
+            # Neighbours with a single edge do not link anything.
+            scale = np.where(degree > 1, 1 / (degree - 1), 0)
+        elif weighting == 'hyperbolic':
+            scale = np.where(degree > 0, 1 / degree, 0)
+        else:
+            scale = np.ones(len(degree))
+    product = (matrix.T @ sparse.diags(scale) @ matrix).tocoo()
+    upper = (product.row < product.col) & (product.data > 0)
+    weights = product.data[upper]
+    if weighting == 'count':
+        # Write counts like the other graphs do.
+        weights = np.rint(weights).astype(np.int64)
+    return (np.column_stack([product.row[upper], product.col[upper]]),
+            weights)
+
+
+def projection_graph(graph, mode, weighting='count', k=0):
+    """
+    Return a one-mode projection of a bipartite graph.
+
+    :parameters:
+        - `graph`: A bipartite :class:`tcflib.tcf.Graph`. Its boolean node
+          attribute `type` gives the mode of each node.
+        - `mode`: False to project onto the nodes of the first mode, True
+          for the second.
+        - `weighting`: One of :data:`WEIGHTINGS`.
+        - `k`: If greater than zero, only keep the k strongest edges of
+          each node.
+    :returns:
+        - A :class:`tcflib.tcf.Graph` with the nodes of that mode, which
+          keep their attributes and tokens. Its `weight` is the name of
+          the weighting.
+
+    """
+    edges, weights = edge_arrays(graph)
+    types = np.array(graph._graph.vs['type'] if len(graph.nodes) else [],
+                     dtype=bool)
+    matrix, row_nodes, col_nodes = biadjacency_matrix(edges, types)
+    if mode:
+        nodes = col_nodes
+    else:
+        matrix = matrix.T.tocsr()
+        nodes = row_nodes
+    pairs, pair_weights = project(matrix, weighting)
+    if k > 0:
+        mask = topk(pairs, pair_weights, len(nodes), k=k)
+        pairs, pair_weights = pairs[mask], pair_weights[mask]
+    projected = tcf.Graph(label=graph.label, weight=weighting)
+    projected._graph = graph._graph.induced_subgraph(nodes.tolist())
+    projected._graph.delete_edges(None)
+    # Token pairs of the bipartite edges do not apply to projected edges.
+    for attribute in projected._graph.es.attributes():
+        del projected._graph.es[attribute]
+    projected._graph.add_edges(pairs.tolist(),
+                               {'weight': pair_weights.tolist()})
+    return projected
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module implements an index of entity and coreference resolution.
+
+Token filters that follow references check the tokens of a token's
+reference every time the token is tested. A :class:`ResolutionIndex` is
+built once per document instead, so that these filters become lookups.
+
+"""
+
+#: The default mapping of entity classes to canonical classes. It maps the
+#: long forms of the CoNLL tags to the short ones.
+ENTITY_CLASSES = {
+    'PERSON': 'PER',
+    'ORGANIZATION': 'ORG',
+    'LOCATION': 'LOC',
+}
+
+
+def parse_class_map(items):
+    """
+    Parse a list of `RAW:CANONICAL` entity class mappings into a dict.
+
+    :raises ValueError: if an item has no colon.
+
+    """
+    class_map = {}
+    for item in items:
+        if not item:
+            continue
+        raw, sep, canonical = item.partition(':')
+        if not sep:
+            raise ValueError(item)
+        class_map[raw] = canonical
+    return class_map
+
+
+class ResolutionIndex:
+    """
+    An index of the entity classes and referenced tokens of all tokens.
+
+    :parameters:
+        - `corpus`: A :class:`tcflib.tcf.TextCorpus` with a tokens layer.
+          Named entities and references are used if present.
+        - `class_map`: A dict mapping entity classes to canonical classes.
+          Classes not in the dict are used as they are.
+
+    """
+
+    def __init__(self, corpus, class_map=None):
+        self.corpus = corpus
+        self.class_map = ENTITY_CLASSES if class_map is None else class_map
+        #: Maps token IDs to a frozenset of the canonical classes of the
+        #: token's entity and the entities of its reference's tokens. Tokens
+        #: without any entity are not in the dict.
+        self.classes = {}
+        self._resolved = {}
+        # References are shared by several tokens, resolve them only once.
+        reference_classes = {}
+        for token in corpus.tokens:
+            classes = set()
+            if token.entity is not None:
+                classes.add(self.canonical_class(token.entity.class_))
+            if token.reference is not None:
+                key = id(token.reference)
+                if key not in reference_classes:
+                    reference_classes[key] = {
+                            self.canonical_class(reftoken.entity.class_)
+                            for reftoken in token.reference.tokens
+                            if reftoken.entity is not None}
+                classes |= reference_classes[key]
+            if classes:
+                self.classes[token.id] = frozenset(classes)
+
+    def canonical_class(self, class_):
+        return self.class_map.get(class_, class_)
+
+    def resolve(self, name, test):
+        """
+        Return the tokens that pass `test` for each token, following
+        references.
+
+        A token resolves to itself if it passes the test. Otherwise, it
+        resolves to the tokens of its reference that pass. The result is
+        computed once per `name`.
+
+        :parameters:
+            - `name`: A name for the test, which must not change its result
+              for the same name.
+            - `test`: A function that takes a token and returns a boolean.
+        :returns:
+            - A dict mapping token IDs to tuples of tokens. Tokens that
+              resolve to no tokens are not in the dict.
+
+        """
+        try:
+            return self._resolved[name]
+        except KeyError:
+            pass
+        resolved = self._resolved[name] = {}
+        for token in self.corpus.tokens:
+            if test(token):
+                resolved[token.id] = (token,)
+            elif token.reference is not None:
+                reftokens = tuple(reftoken for reftoken
+                                  in token.reference.tokens
+                                  if test(reftoken))
+                if reftokens:
+                    resolved[token.id] = reftokens
+        return resolved
@@ -22,13 +22,41 @@ This annotator helps test the dependency network service.
 """
 
 import os
+from concurrent.futures import ProcessPoolExecutor
 
 import igraph
 from tcflib import tcf
 from tcflib.service import run_as_cli
 
 from tcfnetworks.annotators.dependency import DependencyWorker
-from tcfnetworks.utils import tcf_to_graph
+from tcfnetworks.utils import graph_to_igraph
+
+
+def render_graph(graph, filebase, layout_method, output, root=None):
+    """
+    Write a graph to files, one per format in `output`.
+
+    This function runs in worker processes, so it only gets picklable
+    arguments.
+
+    :parameters:
+        - `graph`: An :class:`igraph.Graph` with a `label` node attribute.
+        - `filebase`: The output path without extension.
+        - `layout_method`: The igraph layout method used for drawing.
+        - `output`: A list of formats, `svg` and `graphml`.
+        - `root`: The root node index for the `tree` layout.
+
+    """
+    if 'graphml' in output:
+        graph.write_graphml(filebase + '.graphml')
+    if 'svg' in output:
+        if layout_method == 'tree':
+            layout = graph.layout_reingold_tilford(root=[root])
+        else:
+            layout = graph.layout(layout_method)
+        igraph.plot(graph, filebase + '.svg', layout=layout,
+                    vertex_color='#1f77b4', edge_color='#999',
+                    vertex_frame_color='#fff', label_size=14)
 
 
 class ComparingWorker(DependencyWorker):
@@ -41,80 +69,74 @@ class ComparingWorker(DependencyWorker):
         'methods': ['dependency_tree',
                     'lexical:dependency:lemma',
                     'semantic:semantic:semantic_unit'],
-        'output': ['svg', 'graphml']
+        'output': ['svg', 'graphml'],
+        'processes': 0,  # number of rendering processes, 0 for all CPUs
     }.items()))
 
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.method_workers = {}
+
     def add_annotations(self):
         outdir = 'output'
         if not os.path.isdir(outdir):
             os.mkdir(outdir)
-        for i, parse in enumerate(
-                self.corpus.xpath('text:depparsing/text:parse['
-                'position() >= $start and position() < $end]',
-                start=self.options.first,
-                end=self.options.first + self.options.number,
-                namespaces=tcf.NS), start=1):
-            for method, graph in self.iter_graphs(parse):
-                # Easiest way to get the graph into iGraph: save it as GraphML
-                # and load it.
-                if method == 'dependency_tree':
-                    graph = tcf_to_graph(graph)
-                    layout_method = 'tree'
-                else:
-                    graph.vs['label'] = graph.vs['name']
-                    layout_method = 'kamada_kawai'
-                label = method.replace(':', '_')
-                filebase = os.path.join(outdir, '{count:03d}_{label}'.format(
-                                                count=i, label=label))
-                if 'graphml' in self.options.output:
-                    graph.write_graphml(filebase + '.graphml')
-                if 'svg' in self.options.output:
-                    # Draw
-                    if layout_method == 'tree':
-                        root_token = self.corpus.find_token(parse.root)
-                        root = graph.vs.find(label=root_token.text)
-                        layout = graph.layout_reingold_tilford(
-                                                            root=[root.index])
+        first = self.options.first - 1
+        parses = list(self.corpus.depparsing)[
+                first:first + self.options.number]
+        # Layout and drawing take most of the time, so they run in parallel.
+        with ProcessPoolExecutor(self.options.processes or None) as executor:
+            jobs = []
+            for i, parse in enumerate(parses, start=1):
+                for method, graph in self.iter_graphs(parse):
+                    graph = graph_to_igraph(graph, tokens=False)
+                    root = None
+                    if method == 'dependency_tree':
+                        # Nodes are single token instances, named by token
+                        # ID. Use the token text as label instead.
+                        graph.vs['label'] = [self.corpus.tokens[name].text
+                                             for name in graph.vs['name']]
+                        root = graph.vs.find(name=parse.root.id).index
+                        layout_method = 'tree'
                     else:
-                        layout = graph.layout(layout_method)
-                    igraph.plot(graph, filebase + '.svg', layout=layout,
-                                vertex_color='#1f77b4', edge_color='#999',
-                                vertex_frame_color='#fff', label_size=14)
+                        graph.vs['label'] = graph.vs['name']
+                        layout_method = 'kamada_kawai'
+                    label = method.replace(':', '_')
+                    filebase = os.path.join(outdir,
+                            '{count:03d}_{label}'.format(count=i,
+                                                         label=label))
+                    jobs.append(executor.submit(render_graph, graph, filebase,
+                                                layout_method,
+                                                self.options.output, root))
+            for job in jobs:
+                # Raise exceptions from the worker processes.
+                job.result()
 
     def iter_graphs(self, parse):
         for method in self.options.methods:
             if method == 'dependency_tree':
                 yield (method, self.parse_to_tree(parse))
                 continue
-            self.options.nodes, self.options.edges, self.options.label = \
-                    method.split(':')
-            yield (method, self.parse_to_graph(parse))
+            yield (method, self.method_worker(method).parse_to_graph(parse))
+
+    def method_worker(self, method):
+        """Return a worker for a `nodes:edges:label` method."""
+        if method not in self.method_workers:
+            nodes, edges, label = method.split(':')
+            self.method_workers[method] = self.make_configuration({
+                    'nodes': nodes, 'edges': edges, 'label': label})
+        worker = self.method_workers[method]
+        self.share_corpus(worker)
+        return worker
 
     def parse_to_tree(self, parse):
-        graph = tcf.Element(tcf.P_TEXT + 'graph')
-        nodes = tcf.SubElement(graph, tcf.P_TEXT + 'nodes')
-        edges = tcf.SubElement(graph, tcf.P_TEXT + 'edges')
-        for a_id, b_id in self.find_dependency_edges(parse, parse.root):
-            # Find or add nodes.
-            # Since we want single token instances, not lemmas, we use the
-            # token ID as node label for now. We replace it with the token text
-            # later.
-            node_a = nodes.find_node(a_id)
-            if node_a is None:
-                node_a = nodes.add_node(a_id)
-            node_b = nodes.find_node(b_id)
-            if node_b is None:
-                node_b = nodes.add_node(b_id)
-            # add edge or increment weight
-            edge = edges.find_edge(node_a.get('ID'), node_b.get('ID'))
-            if edge is None:
-                # add edge
-                edge = edges.add_edge(node_a.get('ID'), node_b.get('ID'))
-        # Replace token IDs with token text now.
-        for node in nodes.findall(tcf.P_TEXT + 'node'):
-            token_id = node.text
-            token = self.corpus.find_token(token_id)
-            node.text = token.text
+        # Since we want single token instances, not lemmas, we use the
+        # token ID as node label.
+        graph = tcf.Graph(label='id')
+        for a, b in self.find_dependency_edges(parse, parse.root):
+            graph.node_for_token(a)
+            graph.node_for_token(b)
+            graph.edge_for_tokens(a, b)
         return graph
 
     def find_dependency_edges(self, parse, head):
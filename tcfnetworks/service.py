@@ -0,0 +1,469 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module runs the TCFnetworks workers as a persistent local web service.
+
+Running a worker through :func:`tcflib.service.run_as_cli` pays for
+interpreter startup, imports, tag set construction and stop word loading
+on every call. The service keeps a pool of worker processes alive instead.
+Each process imports all workers once and keeps configured worker instances
+around, so repeated requests only pay for the actual work.
+
+The HTTP interface is compatible with the one of tcflib, except that the
+worker is selected by the path::
+
+    POST /cooccurrence?method=window&window=2   (TCF input as body)
+    GET  /metrics                               (timing metrics as JSON)
+    GET  /                                      (list of workers)
+
+Requests are accepted by an asyncio front end and handed to a process pool.
+If more than `queue_size` requests are pending, new requests are rejected
+with status 503, so that clients can back off.
+
+"""
+
+import os
+import time
+import json
+import asyncio
+import argparse
+import logging
+import http.client
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+from tcflib import tcf
+
+from tcfnetworks.workers import (WORKERS, get_worker_class, parse_options,
+                                 options_key)
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+    504: 'Gateway Timeout',
+}
+
+#: Options that name files or directories on the server. Clients must not
+#: set them.
+PATH_OPTIONS = ('metrics', 'profile', 'cache', 'cache_size')
+
+# Per-process cache of configured worker instances.
+_workers = OrderedDict()
+_workers_max = 32
+
+
+def _get_worker(name, options):
+    key = (name, options_key(options))
+    try:
+        _workers.move_to_end(key)
+        return _workers[key]
+    except KeyError:
+        worker = get_worker_class(name)(**options)
+        _workers[key] = worker
+        if len(_workers) > _workers_max:
+            _workers.popitem(last=False)
+        return worker
+
+
+def _warm_up(names):
+    """Import all workers and set up instances with default options."""
+    for name in names:
+        _get_worker(name, {})
+    return len(names)
+
+
+class _ErrorLog(logging.Handler):
+    """Collects the error messages logged during a job."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def _run_job(name, options, input_data):
+    """
+    Run a worker in a pool process.
+
+    Workers report invalid options or input by logging an error and calling
+    :func:`sys.exit`. This is turned into a :class:`ServiceError` with
+    status 400 and the logged messages, so that it neither ends the pool
+    process nor the service.
+
+    :returns:
+        - A pair of the serialized output and the processing time.
+
+    """
+    start = time.perf_counter()
+    errors = _ErrorLog()
+    logger = logging.getLogger()
+    logger.addHandler(errors)
+    try:
+        worker = _get_worker(name, options)
+        try:
+            output = tcf.serialize(worker.run(input_data))
+        finally:
+            # Do not keep the last corpus alive between requests.
+            worker.corpus = None
+    except SystemExit:
+        raise ServiceError(400, ' '.join(errors.messages))
+    finally:
+        logger.removeHandler(errors)
+    return output, time.perf_counter() - start
+
+
+class ServiceError(Exception):
+    """This exception is raised to answer a request with an error status."""
+
+    def __init__(self, status, message=''):
+        super().__init__(message)
+        self.status = status
+        self.message = message or REASONS[status]
+
+    def __reduce__(self):
+        # Errors are pickled when raised in pool processes.
+        return type(self), (self.status, self.message)
+
+
+class Metrics:
+    """Request-level timing metrics for one worker."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.queue_time = 0.0
+        self.processing_time = 0.0
+        self.total_time = 0.0
+        self.max_total_time = 0.0
+
+    def add(self, queue_time, processing_time, total_time):
+        self.requests += 1
+        self.queue_time += queue_time
+        self.processing_time += processing_time
+        self.total_time += total_time
+        self.max_total_time = max(self.max_total_time, total_time)
+
+    def as_dict(self):
+        n = self.requests or 1
+        return {
+            'requests': self.requests,
+            'errors': self.errors,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'mean_queue_time': self.queue_time / n,
+            'mean_processing_time': self.processing_time / n,
+            'mean_total_time': self.total_time / n,
+            'max_total_time': self.max_total_time,
+        }
+
+
+class WorkerService:
+    """
+    A persistent HTTP service hosting TCFnetworks workers.
+
+    :parameters:
+        - `names`: The names of the workers to host. Defaults to all
+          registered workers.
+        - `processes`: The number of worker processes.
+        - `queue_size`: The maximum number of pending requests, including
+          those being processed. Further requests get status 503.
+        - `timeout`: The maximum time in seconds a request may take.
+        - `max_body`: The maximum request body size in bytes.
+
+    """
+
+    def __init__(self, names=None, *, processes=None, queue_size=16,
+                 timeout=300, max_body=512 * 1024 * 1024):
+        self.names = list(names or WORKERS)
+        for name in self.names:
+            if name not in WORKERS:
+                raise ValueError('No worker "{}".'.format(name))
+        self.processes = processes
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_body = max_body
+        self.pending = 0
+        self.metrics = {name: Metrics() for name in self.names}
+        self.executor = None
+        self.server = None
+        self.slots = None
+
+    async def start(self, host='localhost', port=8080):
+        """Start the process pool and the HTTP server."""
+        n = self.processes or os.cpu_count() or 1
+        self.executor = ProcessPoolExecutor(n)
+        loop = asyncio.get_running_loop()
+        # Start all pool processes now and let them import the workers, so
+        # the first requests do not pay for it.
+        await asyncio.gather(*[
+                loop.run_in_executor(self.executor, _warm_up, self.names)
+                for _ in range(n)])
+        self.slots = asyncio.Semaphore(n)
+        self.server = await asyncio.start_server(self.handle, host, port)
+        logging.info('Serving {} on {}:{} with {} processes.'.format(
+                ', '.join(self.names), host, self.port, n))
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    async def handle(self, reader, writer):
+        try:
+            status, headers, body = await self.respond(reader)
+        except ServiceError as e:
+            status, headers = e.status, {}
+            body = e.message.encode('utf-8')
+        except Exception as e:
+            logging.exception('Error handling request.')
+            status, headers = 500, {}
+            body = str(e).encode('utf-8')
+        headers.setdefault('Content-Type', 'text/plain; charset=utf-8')
+        headers['Content-Length'] = str(len(body))
+        headers['Connection'] = 'close'
+        head = ['HTTP/1.1 {} {}'.format(status, REASONS[status])]
+        head.extend('{}: {}'.format(key, value)
+                    for key, value in headers.items())
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+        writer.write(body)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    async def respond(self, reader):
+        request_line = await reader.readline()
+        try:
+            method, target, _ = request_line.decode('latin-1').split()
+        except ValueError:
+            raise ServiceError(400)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            key, _, value = line.decode('latin-1').partition(':')
+            headers[key.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        name = url.path.strip('/')
+        if method == 'GET':
+            if name == 'metrics':
+                return self.json_response(self.get_metrics())
+            if name == '':
+                return self.json_response(self.names)
+            raise ServiceError(404)
+        if method != 'POST':
+            raise ServiceError(405)
+        # Accept the tcflib style route as an alias for the first worker.
+        if name == 'annotate':
+            name = self.names[0]
+        if name not in self.metrics:
+            raise ServiceError(404, 'No worker "{}".'.format(name))
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            raise ServiceError(400, 'Invalid Content-Length.')
+        if length < 0:
+            raise ServiceError(400, 'Invalid Content-Length.')
+        if length > self.max_body:
+            raise ServiceError(413)
+        input_data = await reader.readexactly(length)
+        items = parse_qsl(url.query)
+        for key, value in items:
+            if key in PATH_OPTIONS:
+                raise ServiceError(400, 'Option "{}" is not available in '
+                                        'the service.'.format(key))
+        try:
+            options = parse_options(get_worker_class(name), items)
+        except ValueError as e:
+            raise ServiceError(400, str(e))
+        return await self.run_worker(name, options, input_data)
+
+    async def run_worker(self, name, options, input_data):
+        """
+        Run a job in the process pool.
+
+        A request holds its slot until the job is done in the pool, even if
+        the request timed out before. So all pending requests are counted
+        until their processes are free again.
+
+        """
+        metrics = self.metrics[name]
+        if self.pending >= self.queue_size:
+            metrics.rejected += 1
+            raise ServiceError(503, 'Too many pending requests.')
+        self.pending += 1
+        start = time.perf_counter()
+        try:
+            await self.slots.acquire()
+        except BaseException:
+            self.pending -= 1
+            raise
+        queue_time = time.perf_counter() - start
+        loop = asyncio.get_running_loop()
+        try:
+            future = self.executor.submit(_run_job, name, options,
+                                          input_data)
+        except BaseException:
+            self.release()
+            raise
+        future.add_done_callback(lambda future: self.release_soon(loop))
+        try:
+            output, processing_time = await asyncio.wait_for(
+                    asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            metrics.timeouts += 1
+            raise ServiceError(504)
+        except ServiceError as e:
+            metrics.errors += 1
+            logging.warning('Worker "{}" rejected request: {}'.format(
+                    name, e.message))
+            raise
+        except Exception as e:
+            metrics.errors += 1
+            logging.error('Worker "{}" failed: {}'.format(name, e))
+            raise ServiceError(500, str(e))
+        total_time = time.perf_counter() - start
+        metrics.add(queue_time, processing_time, total_time)
+        headers = {
+            'Content-Type': 'application/octet-stream',
+            'X-Queue-Time': '{:.6f}'.format(queue_time),
+            'X-Processing-Time': '{:.6f}'.format(processing_time),
+        }
+        return 200, headers, output
+
+    def release(self):
+        """Release the slot of a finished job."""
+        self.slots.release()
+        self.pending -= 1
+
+    def release_soon(self, loop):
+        # Called from the thread that manages the process pool.
+        try:
+            loop.call_soon_threadsafe(self.release)
+        except RuntimeError:
+            # The service has been stopped.
+            pass
+
+    def get_metrics(self):
+        return {
+            'pending': self.pending,
+            'queue_size': self.queue_size,
+            'workers': {name: metrics.as_dict()
+                        for name, metrics in self.metrics.items()},
+        }
+
+    def json_response(self, data):
+        body = json.dumps(data, indent=2).encode('utf-8')
+        return 200, {'Content-Type': 'application/json'}, body
+
+    def serve_forever(self, host='localhost', port=8080):
+        """Run the service until interrupted."""
+        async def serve():
+            server = await self.start(host, port)
+            try:
+                await server.serve_forever()
+            finally:
+                await self.stop()
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+
+
+class ServiceClient:
+    """
+    A minimal client for a :class:`WorkerService`.
+
+    Options are passed as keyword arguments. List values are sent as
+    repeated query parameters.
+
+    """
+
+    def __init__(self, host='localhost', port=8080, timeout=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def request(self, method, path, body=None):
+        connection = http.client.HTTPConnection(self.host, self.port,
+                                                timeout=self.timeout)
+        try:
+            connection.request(method, path, body=body)
+            response = connection.getresponse()
+            data = response.read()
+        finally:
+            connection.close()
+        if response.status != 200:
+            raise ServiceError(response.status,
+                               data.decode('utf-8', 'replace'))
+        return data
+
+    def run(self, name, input_data, **options):
+        query = urlencode(options, doseq=True)
+        path = '/{}?{}'.format(name, query) if query else '/' + name
+        return self.request('POST', path, tcf.serialize(input_data))
+
+    def metrics(self):
+        return json.loads(self.request('GET', '/metrics').decode('utf-8'))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    arg_parser.add_argument('-v', '--verbose', action='store_true')
+    arg_parser.add_argument('--host', default='localhost')
+    arg_parser.add_argument('-p', '--port', type=int, default=8080)
+    arg_parser.add_argument('--processes', type=int, default=None)
+    arg_parser.add_argument('--queue-size', type=int, default=16)
+    arg_parser.add_argument('--timeout', type=float, default=300)
+    arg_parser.add_argument('workers', nargs='*',
+                            help='Workers to host (default: all): {}.'.format(
+                                    ', '.join(WORKERS)))
+    args = arg_parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose
+                        else logging.INFO)
+    try:
+        service = WorkerService(args.workers, processes=args.processes,
+                                queue_size=args.queue_size,
+                                timeout=args.timeout)
+    except ValueError as e:
+        arg_parser.error(str(e))
+    service.serve_forever(args.host, args.port)
+
+
+if __name__ == '__main__':
+    main()
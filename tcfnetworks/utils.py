@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module converts TCF graphs into data structures for network analysis.
+
+Graphs can be given as :class:`tcflib.tcf.Graph` objects, as built by the
+annotators, as TCF graph layer elements, or as :class:`igraph.Graph`
+objects. None of the conversions goes through a serialization format like
+GraphML.
+
+NumPy and SciPy are only required for the functions that return arrays.
+
+"""
+
+import igraph
+from tcflib import tcf
+
+#: Node attributes of the TCF graph layer that hold integers.
+INT_ATTRIBUTES = ('count',)
+#: Edge attributes of the TCF graph layer that hold numbers.
+FLOAT_ATTRIBUTES = ('weight', 'count')
+
+
+def tcf_to_graph(graph_elem):
+    """
+    Convert a TCF graph layer element into an :class:`igraph.Graph`.
+
+    Node texts become the `name` attribute, the `tokenIDs` attribute becomes
+    a list of token IDs. Other attributes are copied, numbers are converted.
+    Token edges are not converted.
+
+    :parameters:
+        - `graph_elem`: A `graph` element.
+    :returns:
+        - An undirected :class:`igraph.Graph`.
+
+    """
+    node_elems = graph_elem.xpath('text:nodes/text:node', namespaces=tcf.NS)
+    edge_elems = graph_elem.xpath('text:edges/text:edge', namespaces=tcf.NS)
+    index = {node_elem.get('ID'): i for i, node_elem in enumerate(node_elems)}
+    vertex_attrs = {'name': [node_elem.text for node_elem in node_elems]}
+    for i, node_elem in enumerate(node_elems):
+        for key, value in node_elem.attrib.items():
+            if key == 'ID':
+                continue
+            elif key == 'tokenIDs':
+                value = value.split()
+            elif key in INT_ATTRIBUTES:
+                value = int(value)
+            vertex_attrs.setdefault(key, [None] * len(node_elems))[i] = value
+    edges = [(index[edge_elem.get('source')], index[edge_elem.get('target')])
+             for edge_elem in edge_elems]
+    edge_attrs = {}
+    for i, edge_elem in enumerate(edge_elems):
+        for key, value in edge_elem.attrib.items():
+            if key in ('source', 'target'):
+                continue
+            elif key in FLOAT_ATTRIBUTES:
+                value = float(value)
+            edge_attrs.setdefault(key, [None] * len(edge_elems))[i] = value
+    return igraph.Graph(n=len(node_elems), edges=edges,
+                        vertex_attrs=vertex_attrs, edge_attrs=edge_attrs)
+
+
+def graph_to_igraph(graph, tokens=True):
+    """
+    Return the :class:`igraph.Graph` of a graph.
+
+    For a :class:`tcflib.tcf.Graph`, this is the graph it wraps, not a copy,
+    so changes affect both.
+
+    :parameters:
+        - `graph`: A :class:`tcflib.tcf.Graph`, a TCF graph layer element or
+          an :class:`igraph.Graph`.
+        - `tokens`: If False, return a copy without the `tokens` attributes
+          of nodes and edges. They reference the whole corpus, so the copy is
+          much smaller when pickled, e.g. to pass it to another process.
+    :returns:
+        - An :class:`igraph.Graph`.
+
+    """
+    if isinstance(graph, tcf.Graph):
+        graph = graph._graph
+    elif not isinstance(graph, igraph.Graph):
+        graph = tcf_to_graph(graph)
+    if not tokens:
+        graph = graph.copy()
+        for sequence in (graph.vs, graph.es):
+            if 'tokens' in sequence.attributes():
+                del sequence['tokens']
+    return graph
+
+
+def edge_arrays(graph, weight='weight'):
+    """
+    Return the edges of a graph as NumPy arrays.
+
+    :parameters:
+        - `graph`: A graph, see :func:`graph_to_igraph`.
+        - `weight`: The edge attribute used as weight. Edges have weight 1
+          if the graph has no such attribute.
+    :returns:
+        - An integer array of shape `(E, 2)` with the source and target
+          node indices and a float array of shape `(E,)` with the weights.
+
+    """
+    import numpy as np
+    graph = graph_to_igraph(graph)
+    edges = np.array(graph.get_edgelist(), dtype=np.intp).reshape(-1, 2)
+    if weight in graph.es.attributes():
+        weights = np.array(graph.es[weight], dtype=float)
+    else:
+        weights = np.ones(len(edges))
+    return edges, weights
+
+
+def adjacency_matrix(graph, weight='weight'):
+    """
+    Return the weighted adjacency matrix of a graph as a sparse matrix.
+
+    Undirected graphs give a symmetric matrix. Weights of multiple edges
+    between the same nodes are summed up.
+
+    :parameters:
+        - `graph`: A graph, see :func:`graph_to_igraph`.
+        - `weight`: The edge attribute used as weight, see
+          :func:`edge_arrays`.
+    :returns:
+        - A :class:`scipy.sparse.csr_matrix` of shape `(N, N)`.
+
+    """
+    import numpy as np
+    from scipy import sparse
+    igraph_graph = graph_to_igraph(graph)
+    edges, weights = edge_arrays(igraph_graph, weight)
+    rows, cols = edges[:, 0], edges[:, 1]
+    if not igraph_graph.is_directed():
+        # Do not count loops twice.
+        other = rows != cols
+        rows, cols = (np.concatenate([rows, cols[other]]),
+                      np.concatenate([cols, rows[other]]))
+        weights = np.concatenate([weights, weights[other]])
+    n = igraph_graph.vcount()
+    return sparse.csr_matrix((weights, (rows, cols)), shape=(n, n))
+
+
+def encode_token_runs(positions):
+    """
+    Encode sorted token positions as delta encoded runs.
+
+    Consecutive positions form a run. A run is written as the gap to the
+    end of the previous run, followed by `+` and the number of further
+    positions if there are any. E.g., the positions 3, 4, 5, 9, 12 and 13
+    are encoded as `3+2 3 2+1`.
+
+    :parameters:
+        - `positions`: A sorted iterable of token positions, i.e. indices
+          into the tokens layer.
+    :returns:
+        - The runs as a string.
+
+    """
+    runs = []
+    start = end = None
+    previous = -1
+    for position in positions:
+        if end is not None and position == end + 1:
+            end = position
+            continue
+        if start is not None:
+            runs.append((start - previous - 1, end - start))
+            previous = end
+        start = end = position
+    if start is not None:
+        runs.append((start - previous - 1, end - start))
+    return ' '.join(str(gap) if not length else '{}+{}'.format(gap, length)
+                    for gap, length in runs)
+
+
+def decode_token_runs(runs):
+    """Decode the token positions of runs, see :func:`encode_token_runs`."""
+    positions = []
+    previous = -1
+    for run in runs.split():
+        gap, sep, length = run.partition('+')
+        start = previous + 1 + int(gap)
+        previous = start + int(length or 0)
+        positions.extend(range(start, previous + 1))
+    return positions
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""
+This module provides a registry of the TCFnetworks workers.
+
+Workers are registered by a short name, so that services and pipelines can
+refer to them without importing every worker module up front.
+
+"""
+
+import logging
+from importlib import import_module
+
+#: Maps worker names to `module:class` paths.
+WORKERS = {
+    'cooccurrence': 'tcfnetworks.annotators.cooccurrence:CooccurrenceWorker',
+    'dependency': 'tcfnetworks.annotators.dependency:DependencyWorker',
+    'graphml': 'tcfnetworks.exporters.graphml:GraphMLWorker',
+    'json': 'tcfnetworks.exporters.d3_json:JSONWorker',
+    'd3_html': 'tcfnetworks.exporters.d3_html:D3HTMLWorker',
+}
+#: The names of the workers that add annotations to a corpus.
+ANNOTATORS = ('cooccurrence', 'dependency')
+#: The names of the workers that export an annotated corpus.
+EXPORTERS = ('graphml', 'json', 'd3_html')
+
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+
+def get_worker_class(name):
+    """
+    Return the worker class registered as `name`.
+
+    :raises KeyError: if no worker is registered under that name.
+
+    """
+    module_name, class_name = WORKERS[name].split(':')
+    return getattr(import_module(module_name), class_name)
+
+
+def convert_value(default, value):
+    """Convert a string `value` to the type of the option `default`."""
+    if isinstance(default, bool):
+        return value.lower() in TRUE_VALUES
+    return type(default)(value)
+
+
+def parse_options(worker_class, items):
+    """
+    Convert string option values to the types of the worker's defaults.
+
+    This mirrors what the command line interface of
+    :func:`tcflib.service.run_as_cli` does: List options can be given
+    several times, all other options take a single value. Unknown options
+    are ignored with a warning.
+
+    :parameters:
+        - `worker_class`: The worker class the options are meant for.
+        - `items`: An iterable of `(key, value)` string pairs.
+    :returns:
+        - A dict of options that can be passed to the worker.
+
+    """
+    options = {}
+    for key, value in items:
+        if key not in worker_class.__options__:
+            logging.warning('Ignoring unknown option "{}".'.format(key))
+            continue
+        default = worker_class.__options__[key]
+        if isinstance(default, list):
+            options.setdefault(key, []).append(convert_value(default[0],
+                                                             value))
+        else:
+            options[key] = convert_value(default, value)
+    return options
+
+
+def options_key(options):
+    """Return a hashable, order independent representation of `options`."""
+    return tuple(sorted((key, tuple(value) if isinstance(value, list)
+                         else value)
+                        for key, value in options.items()))
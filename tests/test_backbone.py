@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for backbone extraction with hand-computed fixtures.
+
+"""
+
+import unittest
+
+try:
+    import numpy as np
+    from tcfnetworks import backbone
+except ImportError:
+    np = None
+
+from tcflib import tcf
+
+
+def arrays(edges, weights):
+    return np.array(edges), np.array(weights, dtype=float)
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed.')
+class TestDisparity(unittest.TestCase):
+
+    def test_star(self):
+        # The center has strength 13 and degree 4. The heavy edge has
+        # (1 - 10/13)^3 = 27/2197 = 0.0123, the others (12/13)^3 = 0.787.
+        # Leaves have a single edge, which is never significant for them.
+        edges, weights = arrays([(0, 1), (0, 2), (0, 3), (0, 4)],
+                                [10, 1, 1, 1])
+        self.assertEqual(backbone.disparity(edges, weights, 5).tolist(),
+                         [True, False, False, False])
+        self.assertEqual(
+                backbone.disparity(edges, weights, 5, alpha=0.01).tolist(),
+                [False, False, False, False])
+
+    def test_uniform_star(self):
+        edges, weights = arrays([(0, 1), (0, 2), (0, 3)], [2, 2, 2])
+        self.assertFalse(backbone.disparity(edges, weights, 4).any())
+
+    def test_either_node(self):
+        # Edge (0, 1) has 9/10 of the strength of node 0, which has two
+        # edges: (1 - 9/10)^1 = 0.1. For node 1, it has 1/3 of the strength
+        # of three edges: (1 - 1/3)^2 = 0.444.
+        edges, weights = arrays([(0, 1), (0, 2), (1, 3), (1, 4)],
+                                [9, 1, 9, 9])
+        self.assertEqual(
+                backbone.disparity(edges, weights, 5, alpha=0.2).tolist(),
+                [True, False, False, False])
+        self.assertFalse(backbone.disparity(edges, weights, 5,
+                                            alpha=0.05).any())
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed.')
+class TestNoiseCorrected(unittest.TestCase):
+
+    # Node strengths are 12, 11, 7 and 6, the total strength is 36. The
+    # score of an edge is (kappa * w - 1) / (kappa * w + 1) with
+    # kappa = 36 / (strength_i * strength_j).
+    edges = [(0, 1), (0, 2), (1, 2), (2, 3), (0, 3)]
+    weights = [10, 1, 1, 5, 1]
+    scores = [19 / 41, -2 / 5, -41 / 113, 23 / 37, -1 / 3]
+    variances = [0.0014771831981160253, 0.18293016549913946,
+                 0.1799684147995795, 0.0015596843306294082,
+                 0.17321645116516912]
+
+    def test_scores(self):
+        score, variance = backbone.noise_corrected_scores(
+                *arrays(self.edges, self.weights), 4)
+        np.testing.assert_allclose(score, self.scores, rtol=1e-12)
+        np.testing.assert_allclose(variance, self.variances, rtol=1e-9)
+
+    def test_keep(self):
+        edges, weights = arrays(self.edges, self.weights)
+        self.assertEqual(
+                backbone.noise_corrected(edges, weights, 4).tolist(),
+                [True, False, False, True, False])
+        # Even with a high alpha, negative scores are not kept.
+        self.assertEqual(
+                backbone.noise_corrected(edges, weights, 4,
+                                         alpha=0.45).tolist(),
+                [True, False, False, True, False])
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed.')
+class TestKCore(unittest.TestCase):
+
+    # A triangle with a path of two edges attached to node 2.
+    edges = [(0, 1), (1, 2), (0, 2), (2, 3), (3, 4)]
+
+    def test_kcore(self):
+        edges, weights = arrays(self.edges, [1] * 5)
+        self.assertEqual(backbone.kcore(edges, weights, 5, k=1).tolist(),
+                         [True] * 5)
+        # Removing node 4 leaves node 3 with a single edge as well.
+        self.assertEqual(backbone.kcore(edges, weights, 5, k=2).tolist(),
+                         [True, True, True, False, False])
+        self.assertFalse(backbone.kcore(edges, weights, 5, k=3).any())
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed.')
+class TestTopK(unittest.TestCase):
+
+    def test_topk(self):
+        # The strongest edge of nodes 0 and 1 is (0, 1), that of node 2 is
+        # (0, 2).
+        edges, weights = arrays([(0, 1), (0, 2), (1, 2)], [3, 2, 1])
+        self.assertEqual(backbone.topk(edges, weights, 3, k=1).tolist(),
+                         [True, True, False])
+        self.assertEqual(backbone.topk(edges, weights, 3, k=2).tolist(),
+                         [True, True, True])
+
+    def test_ties(self):
+        # Ties are broken by edge order.
+        edges, weights = arrays([(0, 1), (0, 2), (1, 2)], [1, 1, 1])
+        self.assertEqual(backbone.topk(edges, weights, 3, k=1).tolist(),
+                         [True, True, False])
+
+    def test_star(self):
+        # Each leaf keeps its only edge.
+        edges, weights = arrays([(0, 1), (0, 2), (0, 3)], [3, 2, 1])
+        self.assertTrue(backbone.topk(edges, weights, 4, k=1).all())
+
+
+@unittest.skipIf(np is None, 'NumPy is not installed.')
+class TestExtractBackbone(unittest.TestCase):
+
+    def test_methods_in_order(self):
+        graph = tcf.Graph()
+        graph._graph.add_vertices(5)
+        graph._graph.add_edges([(0, 1), (1, 2), (0, 2), (2, 3), (3, 4)],
+                               {'weight': [1, 1, 1, 5, 1]})
+        kept = backbone.extract_backbone(graph, ['kcore', 'topk'], k=2)
+        self.assertEqual(kept, [('kcore', 3), ('topk', 3)])
+        self.assertEqual(graph._graph.get_edgelist(),
+                         [(0, 1), (1, 2), (0, 2)])
+        self.assertEqual(graph._graph.vcount(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
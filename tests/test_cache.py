@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the result cache of the annotators.
+
+"""
+
+import json
+import shutil
+import tempfile
+import unittest
+
+from tcflib import tcf
+
+from tcfnetworks.annotators.cooccurrence import CooccurrenceWorker
+
+
+def make_corpus(lemmas):
+    """Build a corpus of common nouns in Python, without parsing XML."""
+    corpus = tcf.TextCorpus()
+    corpus.add_layer(tcf.Tokens())
+    corpus.add_layer(tcf.Lemmas())
+    corpus.add_layer(tcf.POStags('DC-1345'))
+    for lemma in lemmas:
+        token = tcf.Token(lemma)
+        token.lemma = lemma
+        token.tag = 'commonNoun'
+        corpus.tokens.append(token)
+    return corpus
+
+
+class TestResultCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.metrics = tempfile.NamedTemporaryFile('r', suffix='.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        self.metrics.close()
+
+    def run_worker(self, corpus, **options):
+        options.setdefault('window', [2])
+        worker = CooccurrenceWorker(cache=self.directory, label='lemma',
+                                    metrics=self.metrics.name, **options)
+        corpus = worker.run(corpus)
+        self.metrics.seek(0)
+        counters = json.load(self.metrics)['counters']
+        return corpus, counters.get('cache_hits', 0)
+
+    def nodes(self, corpus):
+        return [node.text for node in corpus.tree.iterfind(
+                './/{0}graph/{0}nodes/{0}node'.format(tcf.P_TEXT))]
+
+    def test_corpora_built_in_python(self):
+        first, hit = self.run_worker(make_corpus(['dog', 'cat', 'house']))
+        self.assertFalse(hit)
+        second, hit = self.run_worker(make_corpus(['car', 'tree', 'road']))
+        self.assertFalse(hit)
+        self.assertEqual(self.nodes(second), ['car', 'tree', 'road'])
+
+    def test_hit(self):
+        first, hit = self.run_worker(make_corpus(['dog', 'cat', 'house']))
+        second, hit = self.run_worker(make_corpus(['dog', 'cat', 'house']))
+        self.assertTrue(hit)
+        self.assertEqual(self.nodes(second), self.nodes(first))
+        # Only the graph is cached, not the layers of the input.
+        layers = [layer.tag for layer in second.tree.find(
+                tcf.P_TEXT + 'TextCorpus')]
+        self.assertEqual(layers, [tcf.P_TEXT + name for name
+                                  in ('tokens', 'lemmas', 'POStags',
+                                      'graph')])
+
+    def test_options(self):
+        lemmas = ['dog', 'cat', 'house']
+        self.run_worker(make_corpus(lemmas), spill=True, memory_budget=1)
+        _, hit = self.run_worker(make_corpus(lemmas), spill=True,
+                                 memory_budget=2)
+        self.assertTrue(hit)
+        _, hit = self.run_worker(make_corpus(lemmas), spill=True,
+                                 window=[3])
+        self.assertFalse(hit)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the lazily parsed text corpus.
+
+"""
+
+import unittest
+from unittest import mock
+
+from lxml import etree
+from tcflib import tcf
+
+from tcfnetworks.annotators.cooccurrence import CooccurrenceWorker
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+from tcfnetworks.corpus import LazyTextCorpus, LAYER_ATTRIBUTES
+from tcfnetworks.exporters.graphml import GraphMLWorker
+
+
+def canonical(output):
+    """
+    Return the serialized input layers and a canonical form of the graph.
+
+    The order of nodes and of the token pairs of edges depends on set
+    iteration order, which differs between runs. So do node attributes
+    taken from an arbitrary token, like `type` and `class`.
+
+    """
+    root = etree.fromstring(tcf.serialize(output))
+    graph_elem = root.find('.//' + tcf.P_TEXT + 'graph')
+    graph_elem.getparent().remove(graph_elem)
+    names = {}
+    nodes = []
+    for node_elem in graph_elem.iter(tcf.P_TEXT + 'node'):
+        names[node_elem.get('ID')] = node_elem.text
+        nodes.append((node_elem.text, node_elem.get('count'),
+                      sorted(node_elem.get('tokenIDs').split())))
+    edges = []
+    for edge_elem in graph_elem.iter(tcf.P_TEXT + 'edge'):
+        pairs = sorted(tuple(sorted((elem.get('source'), elem.get('target'))))
+                       + (elem.get('weight'),) for elem in edge_elem)
+        edges.append((sorted((names[edge_elem.get('source')],
+                              names[edge_elem.get('target')])),
+                      edge_elem.get('weight'), pairs))
+    return etree.tostring(root), sorted(nodes), sorted(edges)
+
+
+def describe_tokens(corpus):
+    return [(token.id, token.text, token.lemma, token.tag,
+             token.entity.class_ if token.entity else None,
+             token.reference.id if token.reference else None)
+            for token in corpus.tokens]
+
+
+class TestLazyTextCorpus(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = generate_corpus(sentences=30)
+
+    def test_layers_same_as_eager(self):
+        eager = tcf.TextCorpus(self.data)
+        lazy = LazyTextCorpus(self.data)
+        self.assertEqual(describe_tokens(lazy), describe_tokens(eager))
+        self.assertEqual(
+                [[token.id for token in sentence.tokens]
+                 for sentence in lazy.sentences],
+                [[token.id for token in sentence.tokens]
+                 for sentence in eager.sentences])
+        self.assertEqual(
+                [(span.type, [token.id for token in span.tokens])
+                 for span in lazy.textstructure],
+                [(span.type, [token.id for token in span.tokens])
+                 for span in eager.textstructure])
+        self.assertEqual(len(lazy.depparsing), len(eager.depparsing))
+
+    def test_serialization_same_as_eager(self):
+        eager = tcf.TextCorpus(self.data)
+        lazy = LazyTextCorpus(self.data)
+        lazy.tokens  # Building layers must not write them again.
+        self.assertEqual(tcf.serialize(lazy), tcf.serialize(eager))
+
+    def test_worker_output_same_as_eager(self):
+        for options in ({}, {'method': 'sentence'},
+                        {'method': 'textspan', 'spantype': 'paragraph'},
+                        {'nodes': 'actor'}):
+            with self.subTest(**options):
+                lazy = CooccurrenceWorker(**options).run(self.data)
+                eager = CooccurrenceWorker(**options).run(
+                        tcf.TextCorpus(self.data))
+                self.assertEqual(canonical(lazy), canonical(eager))
+
+    def test_layers_built_on_access(self):
+        corpus = LazyTextCorpus(self.data, layers=['tokens', 'lemmas'])
+        self.assertEqual(corpus._loaded, set())
+        self.assertNotIn('tokens', vars(corpus))
+        corpus.tokens
+        # Token layers are applied along with the tokens.
+        self.assertEqual(corpus._loaded, {'tokens', 'lemmas'})
+        self.assertTrue(all(token.lemma for token in corpus.tokens))
+        # Layers that were not declared are not available.
+        with self.assertRaises(AttributeError):
+            corpus.depparsing
+        self.assertIsNone(next(iter(corpus.tokens)).tag)
+
+    def test_undeclared_layers_not_read(self):
+        readers = {'_read_{}'.format(tag.lower()): mock.DEFAULT
+                   for tag in ('depparsing', 'sentences', 'textstructure')}
+        with mock.patch.multiple(LazyTextCorpus, **readers) as mocks:
+            CooccurrenceWorker().run(self.data)
+        for reader in mocks.values():
+            reader.assert_not_called()
+
+    def test_prune(self):
+        graph_data = tcf.serialize(CooccurrenceWorker().run(self.data))
+        corpus = LazyTextCorpus(graph_data, layers=GraphMLWorker.layers,
+                                prune=True)
+        layers = [etree.QName(layer_elem).localname for layer_elem
+                  in corpus.tree.find(tcf.P_TEXT + 'TextCorpus')]
+        self.assertEqual(layers, ['graph'])
+        for attribute in LAYER_ATTRIBUTES.values():
+            with self.assertRaises(AttributeError):
+                getattr(corpus, attribute)
+        # Exporting from the pruned tree gives the same result.
+        self.assertEqual(
+                tcf.serialize(GraphMLWorker().run(graph_data)),
+                tcf.serialize(GraphMLWorker().run(
+                        tcf.TextCorpus(graph_data))))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for counting in external memory.
+
+"""
+
+import os
+import json
+import random
+import tempfile
+import unittest
+from unittest import mock
+from collections import Counter
+
+from tcflib import tcf
+
+from tcfnetworks.annotators.cooccurrence import CooccurrenceWorker
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+from tcfnetworks.counting import SpillingPairCounter
+from tcfnetworks.utils import tcf_to_graph
+
+
+class TestSpillingPairCounter(unittest.TestCase):
+
+    def test_counts(self):
+        rng = random.Random(0)
+        pairs = [(rng.randrange(50), rng.randrange(50)) for _ in range(5000)]
+        with SpillingPairCounter() as counter:
+            counter.chunk_size = 100
+            for a, b in pairs:
+                counter.add(a, b)
+            counts = [(a, b, count) for a, b, count in counter]
+            self.assertGreater(len(counter.runs), 1)
+        self.assertEqual(counts, sorted((a, b, count) for (a, b), count
+                                        in Counter(pairs).items()))
+
+    def test_merge_passes(self):
+        rng = random.Random(1)
+        pairs = [(rng.randrange(30), rng.randrange(30)) for _ in range(3000)]
+        merged = []
+        with tempfile.TemporaryDirectory() as directory:
+            with SpillingPairCounter(tmpdir=directory,
+                                     max_runs=3) as counter:
+                counter.chunk_size = 100
+                merge_runs = counter.merge_runs
+
+                def record(paths):
+                    merged.append(len(paths))
+                    return merge_runs(paths)
+
+                counter.merge_runs = record
+                for a, b in pairs:
+                    counter.add(a, b)
+                counts = list(counter)
+                self.assertEqual(counter.n_spilled, 30)
+                self.assertLessEqual(len(counter.runs), 3)
+                # Merged runs are removed right away.
+                self.assertEqual(len(os.listdir(directory)),
+                                 len(counter.runs))
+            self.assertEqual(os.listdir(directory), [])
+        self.assertGreater(len(merged), 1)
+        self.assertLessEqual(max(merged), 3)
+        self.assertEqual(counts, sorted((a, b, count) for (a, b), count
+                                        in Counter(pairs).items()))
+
+    def test_in_memory(self):
+        with SpillingPairCounter() as counter:
+            for a, b in [(2, 3), (0, 2 ** 32 - 1), (2, 3)]:
+                counter.add(a, b)
+            self.assertEqual(list(counter), [(0, 2 ** 32 - 1, 1),
+                                             (2, 3, 2)])
+            self.assertEqual(counter.runs, [])
+
+    def test_close(self):
+        counter = SpillingPairCounter()
+        counter.chunk_size = 2
+        for i in range(5):
+            counter.add(i, i)
+        paths = list(counter.runs)
+        self.assertTrue(paths)
+        counter.close()
+        for path in paths:
+            self.assertFalse(os.path.exists(path))
+
+
+class TestSpillingWorker(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = generate_corpus(sentences=100)
+
+    def build(self, **options):
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as metrics:
+            output = CooccurrenceWorker(label='lemma', window=[2, 5],
+                                        metrics=metrics.name,
+                                        **options).run(self.corpus)
+            counters = json.load(metrics)['counters']
+        graph = tcf_to_graph(output.tree.find('.//' + tcf.P_TEXT + 'graph'))
+        nodes = {vertex['name']: vertex['count'] for vertex in graph.vs}
+        edges = {}
+        for edge in graph.es:
+            key = tuple(sorted(graph.vs[edge.tuple]['name']))
+            edges[key] = edge['weight']
+        return nodes, edges, counters
+
+    def test_same_as_in_memory(self):
+        for unique in (False, True):
+            with self.subTest(unique=unique):
+                nodes, edges, _ = self.build(unique=unique)
+                self.assertTrue(edges)
+                spilled_nodes, spilled_edges, counters = self.build(
+                        unique=unique, spill=True, memory_budget=0)
+                # The budget of 0 MiB leaves the smallest possible chunks.
+                self.assertGreater(counters['spilled_runs'], 1)
+                self.assertEqual(spilled_nodes, nodes)
+                self.assertEqual(spilled_edges, edges)
+
+    def test_budget(self):
+        for unique, budget in ((False, 2 ** 20), (True, 2 ** 19)):
+            with self.subTest(unique=unique):
+                with mock.patch(
+                        'tcfnetworks.annotators.cooccurrence.'
+                        'SpillingPairCounter',
+                        wraps=SpillingPairCounter) as counter_class:
+                    CooccurrenceWorker(spill=True, memory_budget=1,
+                                       unique=unique).run(self.corpus)
+                self.assertEqual(
+                        [call.args for call in counter_class.call_args_list],
+                        [(budget,), (budget,)])
+
+
+if __name__ == '__main__':
+    unittest.main()
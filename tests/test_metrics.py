@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the opt-in instrumentation of workers.
+
+"""
+
+import io
+import os
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stderr
+
+from tcflib import tcf
+
+from tcfnetworks.annotators.cooccurrence import CooccurrenceWorker
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+from tcfnetworks.exporters.graphml import GraphMLWorker
+from tcfnetworks.metrics import Metrics, NULL_METRICS, peak_rss
+
+STAGE_KEYS = {'calls', 'seconds', 'heap_peak', 'peak_rss', 'rss_growth'}
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_stages(self):
+        metrics = Metrics()
+        try:
+            with metrics.stage('outer'):
+                for _ in range(2):
+                    with metrics.stage('inner'):
+                        data = bytearray(2 ** 20)
+                del data
+            metrics.count('things', 3)
+            metrics.count('things')
+        finally:
+            metrics.close()
+        report = metrics.as_dict()
+        self.assertEqual(list(report['stages']), ['inner', 'outer'])
+        inner, outer = report['stages']['inner'], report['stages']['outer']
+        self.assertEqual(set(inner), STAGE_KEYS)
+        self.assertEqual(inner['calls'], 2)
+        self.assertEqual(outer['calls'], 1)
+        self.assertGreaterEqual(outer['seconds'], inner['seconds'])
+        # The enclosing stage keeps the peak of the nested ones.
+        self.assertGreaterEqual(inner['heap_peak'], 2 ** 20)
+        self.assertGreaterEqual(outer['heap_peak'], inner['heap_peak'])
+        self.assertGreaterEqual(outer['rss_growth'], 0)
+        self.assertEqual(report['counters'], {'things': 4})
+
+    def test_null_metrics(self):
+        self.assertFalse(NULL_METRICS.enabled)
+        with NULL_METRICS.stage('stage') as metrics:
+            metrics.count('things')
+        self.assertEqual(NULL_METRICS.as_dict(), {})
+
+    def test_peak_rss(self):
+        self.assertGreater(peak_rss(), 2 ** 20)
+
+
+class TestInstrumentedWorker(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = generate_corpus(sentences=30)
+
+    def run_worker(self, worker_class, input_data, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.json')
+            worker = worker_class(metrics=path, **options)
+            output = worker.run(input_data)
+            with open(path) as infile:
+                report = json.load(infile)
+        # Instrumentation is switched off after the run.
+        self.assertIs(worker.metrics, NULL_METRICS)
+        return output, report
+
+    def test_annotator(self):
+        output, report = self.run_worker(CooccurrenceWorker, self.corpus,
+                                         window=[2])
+        self.assertEqual(report['worker'], 'CooccurrenceWorker')
+        stages = report['stages']
+        self.assertEqual(set(stages), {'total', 'parse', 'filter', 'nodes',
+                                       'edges', 'serialization'})
+        for stage in stages.values():
+            self.assertEqual(set(stage), STAGE_KEYS)
+        self.assertGreaterEqual(stages['total']['seconds'],
+                                stages['edges']['seconds'])
+        counters = report['counters']
+        graph_elem = output.tree.find('.//' + tcf.P_TEXT + 'graph')
+        self.assertEqual(counters['tokens'], len(output.tokens))
+        self.assertEqual(counters['tokens'] - counters['tokens_filtered'],
+                         sum(int(node_elem.get('count')) for node_elem
+                             in graph_elem.iter(tcf.P_TEXT + 'node')))
+        self.assertEqual(counters['edges'],
+                         len(graph_elem.find(tcf.P_TEXT + 'edges')))
+        self.assertGreater(counters['pairs_examined'], counters['edges'])
+
+    def test_exporter(self):
+        annotated = tcf.serialize(CooccurrenceWorker().run(self.corpus))
+        _, report = self.run_worker(GraphMLWorker, annotated)
+        self.assertEqual(report['worker'], 'GraphMLWorker')
+        self.assertEqual(set(report['stages']),
+                         {'total', 'parse', 'serialization'})
+
+    def test_stderr(self):
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            CooccurrenceWorker(metrics='-').run(self.corpus)
+        self.assertEqual(json.loads(stderr.getvalue())['worker'],
+                         'CooccurrenceWorker')
+
+    def test_disabled(self):
+        worker = CooccurrenceWorker()
+        self.assertIs(worker.metrics, NULL_METRICS)
+        stderr = io.StringIO()
+        with redirect_stderr(stderr):
+            worker.run(self.corpus)
+        self.assertEqual(stderr.getvalue(), '')
+
+
+if __name__ == '__main__':
+    unittest.main()
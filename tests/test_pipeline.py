@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for running an annotator and exporters in one process.
+
+"""
+
+import os
+import sys
+import json
+import tempfile
+import unittest
+import subprocess
+
+from tcflib import tcf
+
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+from tcfnetworks.pipeline import Pipeline, worker_path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_script(path, args, input_data):
+    """Run a worker script like on the command line."""
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, os.path.join(ROOT, path)] + args,
+                          input=input_data, stdout=subprocess.PIPE,
+                          stderr=subprocess.DEVNULL, env=env,
+                          check=True).stdout
+
+
+class TestPipeline(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = generate_corpus(sentences=30)
+
+    def test_same_as_cli(self):
+        pipeline = Pipeline.from_names('cooccurrence', ['graphml', 'json'],
+                                       [('window', '2'), ('window', '5')])
+        outputs = [tcf.serialize(output)
+                   for output in pipeline.run(self.corpus)]
+        annotated = run_script('tcfnetworks/annotators/cooccurrence.py',
+                               ['--window', '2', '5'], self.corpus)
+        for path, output in zip(['tcfnetworks/exporters/graphml.py',
+                                 'tcfnetworks/exporters/d3_json.py'],
+                                outputs):
+            with self.subTest(path=path):
+                self.assertEqual(output, run_script(path, [], annotated))
+
+    def test_run_many(self):
+        pipeline = Pipeline.from_names('cooccurrence', ['graphml'])
+        first, second = pipeline.run_many([self.corpus, self.corpus])
+        self.assertEqual(first, second)
+
+    def test_unknown_option(self):
+        with self.assertRaises(ValueError):
+            Pipeline.from_names('cooccurrence', ['graphml'],
+                                [('windw', '2')])
+
+    def test_metrics_per_worker(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'metrics.json')
+            pipeline = Pipeline.from_names('cooccurrence', ['graphml'],
+                                           [('metrics', path)])
+            pipeline.run(self.corpus)
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['metrics.cooccurrence.json',
+                              'metrics.graphml.json'])
+            for name, worker in (('cooccurrence', 'CooccurrenceWorker'),
+                                 ('graphml', 'GraphMLWorker')):
+                with open(worker_path(path, name)) as infile:
+                    self.assertEqual(json.load(infile)['worker'], worker)
+
+    def test_worker_path(self):
+        self.assertEqual(worker_path('out/m.json', 'json'),
+                         'out/m.json.json')
+        self.assertEqual(worker_path('profile', 'graphml'),
+                         'profile.graphml')
+        self.assertEqual(worker_path('-', 'graphml'), '-')
+
+
+if __name__ == '__main__':
+    unittest.main()
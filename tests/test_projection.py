@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for one-mode projections of bipartite graphs.
+
+"""
+
+import unittest
+from collections import Counter
+from itertools import combinations
+
+try:
+    import numpy as np
+    from tcfnetworks import projection
+except ImportError:
+    np = None
+
+from lxml import etree
+from tcflib import tcf
+from tcflib.tagsets import TagSet
+
+from tcfnetworks.annotators.dependency import DependencyWorker
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+
+ISOcat = TagSet('DC-1345')
+
+# A bipartite graph of the verbs v0 to v3 (nodes 0 to 3) and the nouns a to
+# d (nodes 4 to 7). The rows of the biadjacency matrix B are the verbs:
+#
+#       a  b  c  d
+#   v0  1  1  1  0
+#   v1  0  1  1  0
+#   v2  0  0  1  1
+#   v3  1  1  0  0
+#
+NAMES = ['v0', 'v1', 'v2', 'v3', 'a', 'b', 'c', 'd']
+TYPES = [False] * 4 + [True] * 4
+EDGES = [(0, 4), (0, 5), (0, 6), (1, 5), (1, 6), (2, 6), (2, 7), (3, 4),
+         (3, 5)]
+
+# BᵀWB. The verbs have the degrees 3, 2, 2 and 2, so for `newman`, v0
+# counts 1/2 and the others 1, and for `hyperbolic`, v0 counts 1/3 and the
+# others 1/2.
+NOUNS = {
+    'count': {('a', 'b'): 2, ('a', 'c'): 1, ('b', 'c'): 2, ('c', 'd'): 1},
+    'newman': {('a', 'b'): 3 / 2, ('a', 'c'): 1 / 2, ('b', 'c'): 3 / 2,
+               ('c', 'd'): 1},
+    'hyperbolic': {('a', 'b'): 5 / 6, ('a', 'c'): 1 / 3, ('b', 'c'): 5 / 6,
+                   ('c', 'd'): 1 / 2},
+}
+# BWBᵀ. The nouns have the degrees 2, 3, 3 and 1. For `newman`, d links
+# nothing.
+VERBS = {
+    'count': {('v0', 'v1'): 2, ('v0', 'v2'): 1, ('v0', 'v3'): 2,
+              ('v1', 'v2'): 1, ('v1', 'v3'): 1},
+    'newman': {('v0', 'v1'): 1, ('v0', 'v2'): 1 / 2, ('v0', 'v3'): 3 / 2,
+               ('v1', 'v2'): 1 / 2, ('v1', 'v3'): 1 / 2},
+    'hyperbolic': {('v0', 'v1'): 2 / 3, ('v0', 'v2'): 1 / 3,
+                   ('v0', 'v3'): 5 / 6, ('v1', 'v2'): 1 / 3,
+                   ('v1', 'v3'): 1 / 3},
+}
+
+
+def bipartite_graph(edges=EDGES):
+    graph = tcf.Graph()
+    graph._graph.add_vertices(len(NAMES))
+    graph._graph.vs['name'] = NAMES
+    graph._graph.vs['type'] = TYPES
+    graph._graph.add_edges(edges, {'weight': [1] * len(edges)})
+    return graph
+
+
+def named_weights(graph):
+    names = graph._graph.vs['name']
+    return {tuple(sorted((names[edge.source], names[edge.target]))):
+            edge['weight'] for edge in graph._graph.es}
+
+
+@unittest.skipIf(np is None, 'NumPy and SciPy are not installed.')
+class TestProject(unittest.TestCase):
+
+    def test_biadjacency_matrix(self):
+        # Edges within a mode are ignored, multiple edges count once, and
+        # edges may point from the second mode to the first.
+        edges = np.array(EDGES + [(0, 1), (4, 5), (5, 0), (0, 4)])
+        matrix, row_nodes, col_nodes = projection.biadjacency_matrix(
+                edges, np.array(TYPES))
+        self.assertEqual(row_nodes.tolist(), [0, 1, 2, 3])
+        self.assertEqual(col_nodes.tolist(), [4, 5, 6, 7])
+        self.assertEqual(matrix.toarray().tolist(),
+                         [[1, 1, 1, 0], [0, 1, 1, 0], [0, 0, 1, 1],
+                          [1, 1, 0, 0]])
+
+    def check_projection(self, matrix, names, expected):
+        for weighting in projection.WEIGHTINGS:
+            with self.subTest(weighting=weighting):
+                pairs, weights = projection.project(matrix, weighting)
+                result = {(names[a], names[b]): weight
+                          for (a, b), weight in zip(pairs.tolist(),
+                                                    weights.tolist())}
+                self.assertEqual(result.keys(), expected[weighting].keys())
+                for pair, weight in expected[weighting].items():
+                    self.assertAlmostEqual(result[pair], weight)
+                if weighting == 'count':
+                    self.assertEqual(weights.dtype, np.int64)
+                else:
+                    self.assertEqual(weights.dtype, np.float64)
+
+    def test_project(self):
+        matrix, _, _ = projection.biadjacency_matrix(np.array(EDGES),
+                                                     np.array(TYPES))
+        self.check_projection(matrix, NAMES[4:], NOUNS)
+        self.check_projection(matrix.T.tocsr(), NAMES[:4], VERBS)
+
+
+@unittest.skipIf(np is None, 'NumPy and SciPy are not installed.')
+class TestProjectionGraph(unittest.TestCase):
+
+    def test_modes(self):
+        graph = bipartite_graph()
+        for mode, nodes, expected in ((True, NAMES[4:], NOUNS),
+                                      (False, NAMES[:4], VERBS)):
+            for weighting in projection.WEIGHTINGS:
+                with self.subTest(mode=mode, weighting=weighting):
+                    projected = projection.projection_graph(graph, mode,
+                                                            weighting)
+                    self.assertEqual(projected.weight, weighting)
+                    self.assertEqual(projected._graph.vs['name'], nodes)
+                    self.assertEqual(projected._graph.vs['type'],
+                                     [mode] * len(nodes))
+                    weights = named_weights(projected)
+                    self.assertEqual(weights.keys(),
+                                     expected[weighting].keys())
+                    for pair, weight in expected[weighting].items():
+                        self.assertAlmostEqual(weights[pair], weight)
+        # The bipartite graph is not changed.
+        self.assertEqual(graph._graph.get_edgelist(), EDGES)
+
+    def test_topk(self):
+        # The strongest edges of a, c and d are a–b, b–c and c–d. The ties
+        # of b do not matter, as both of its edges are kept for others.
+        projected = projection.projection_graph(bipartite_graph(), True,
+                                                k=1)
+        self.assertEqual(named_weights(projected),
+                         {('a', 'b'): 2, ('b', 'c'): 2, ('c', 'd'): 1})
+        # v0–v3 is the strongest edge of v0 and v3, v0–v1 of v1 and v0–v2
+        # the only edge of v2.
+        projected = projection.projection_graph(bipartite_graph(), False,
+                                                'newman', k=1)
+        self.assertEqual(named_weights(projected),
+                         {('v0', 'v1'): 1, ('v0', 'v2'): 1 / 2,
+                          ('v0', 'v3'): 3 / 2})
+        projected = projection.projection_graph(bipartite_graph(), True,
+                                                k=3)
+        self.assertEqual(named_weights(projected), NOUNS['count'])
+
+    def test_empty(self):
+        projected = projection.projection_graph(bipartite_graph([]), True)
+        self.assertEqual(projected._graph.vcount(), 4)
+        self.assertEqual(projected._graph.ecount(), 0)
+
+
+@unittest.skipIf(np is None, 'NumPy and SciPy are not installed.')
+class TestDependencyProjections(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        corpus = generate_corpus(sentences=40)
+        root = etree.fromstring(tcf.serialize(DependencyWorker(
+                edges='verbs_nouns', projection=['nouns', 'verbs']).run(
+                        corpus)))
+        cls.postags = {
+                token_elem.get('ID'): ISOcat[tag_elem.text]
+                for token_elem, tag_elem in zip(
+                        root.iter(tcf.P_TEXT + 'token'),
+                        root.iter(tcf.P_TEXT + 'tag'))}
+        cls.graphs = {graph_elem.get('config'): graph_elem for graph_elem
+                      in root.iter(tcf.P_TEXT + 'graph')}
+
+    def nodes(self, graph_elem):
+        return {node_elem.get('ID'): node_elem for node_elem
+                in graph_elem.iter(tcf.P_TEXT + 'node')}
+
+    def test_layers(self):
+        self.assertEqual(list(self.graphs),
+                         [None, 'projection=nouns', 'projection=verbs'])
+
+    def test_types(self):
+        # Verbs are of the first mode, their nouns of the second one.
+        nodes = self.nodes(self.graphs[None])
+        types = Counter()
+        for node_elem in nodes.values():
+            types[node_elem.get('type')] += 1
+            for token_id in node_elem.get('tokenIDs').split():
+                self.assertEqual(
+                        self.postags[token_id].is_a(ISOcat['verb']),
+                        node_elem.get('type') == 'false')
+        self.assertEqual(types.keys(), {'false', 'true'})
+        # Edges are undirected, but link a verb and a noun.
+        for edge_elem in self.graphs[None].iter(tcf.P_TEXT + 'edge'):
+            self.assertEqual(
+                    {nodes[edge_elem.get('source')].get('type'),
+                     nodes[edge_elem.get('target')].get('type')},
+                    {'false', 'true'})
+
+    def test_projections(self):
+        # Count the shared neighbours in the serialized bipartite graph.
+        nodes = self.nodes(self.graphs[None])
+        neighbours = {}
+        for edge_elem in self.graphs[None].iter(tcf.P_TEXT + 'edge'):
+            verb, noun = sorted((nodes[edge_elem.get('source')],
+                                 nodes[edge_elem.get('target')]),
+                                key=lambda node_elem: node_elem.get('type'))
+            verb, noun = verb.text, noun.text
+            neighbours.setdefault(('verbs', verb), set()).add(noun)
+            neighbours.setdefault(('nouns', noun), set()).add(verb)
+        for mode, type_ in (('nouns', 'true'), ('verbs', 'false')):
+            with self.subTest(mode=mode):
+                expected = {}
+                # Nodes are linked by the neighbours of the other mode.
+                for (kind, node), linked in neighbours.items():
+                    if kind == mode:
+                        continue
+                    for pair in combinations(sorted(linked), 2):
+                        expected[pair] = expected.get(pair, 0) + 1
+                graph_elem = self.graphs['projection=' + mode]
+                projected = self.nodes(graph_elem)
+                self.assertEqual(
+                        {node_elem.get('type')
+                         for node_elem in projected.values()},
+                        {type_})
+                weights = {}
+                for edge_elem in graph_elem.iter(tcf.P_TEXT + 'edge'):
+                    pair = tuple(sorted(
+                            (projected[edge_elem.get('source')].text,
+                             projected[edge_elem.get('target')].text)))
+                    weights[pair] = int(edge_elem.get('weight'))
+                self.assertTrue(weights)
+                self.assertEqual(weights, expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
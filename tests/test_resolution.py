@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for entity and reference resolution through the resolution index.
+
+"""
+
+import unittest
+from functools import partial
+
+from lxml import etree
+from tcflib import tcf
+from tcflib.tagsets import TagSet
+
+from tcfnetworks.annotators.cooccurrence import CooccurrenceWorker
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+from tcfnetworks.resolution import ResolutionIndex, parse_class_map
+
+ISOcat = TagSet('DC-1345')
+
+# The token tests as they were before the resolution index, which checked
+# the tokens of a token's reference every time the token was tested.
+
+
+def entity_lookup(token, resolve=True):
+    if token.entity is not None:
+        return True
+    if resolve and token.reference is not None:
+        for reftoken in token.reference.tokens:
+            if entity_lookup(reftoken, False):
+                return True
+    return False
+
+
+def actor_lookup(token, actor_classes, resolve=True):
+    if token.entity is not None:
+        if token.entity.class_ in actor_classes:
+            return True
+    if resolve and token.reference is not None:
+        for reftoken in token.reference.tokens:
+            if actor_lookup(reftoken, actor_classes, False):
+                return True
+    return False
+
+
+def postag_lookup(token, postags, stopwords, resolve=True):
+    has_pos = False
+    for postag in postags:
+        if token.postag.is_a(postag):
+            has_pos = True
+            break
+    if has_pos:
+        return token.text not in stopwords
+    if resolve and token.reference is not None:
+        for reftoken in token.reference.tokens:
+            if postag_lookup(reftoken, postags, stopwords, False):
+                return reftoken.text not in stopwords
+    return False
+
+
+def widen_references(data):
+    """
+    Return `data` with references that also span the two preceding tokens.
+
+    The references of the synthetic corpus span single tokens, so the
+    tokens of a reference are only the token itself.
+
+    """
+    root = etree.fromstring(data)
+    for ref_elem in root.iter(tcf.P_TEXT + 'reference'):
+        n = int(ref_elem.get('tokenIDs')[2:])
+        ref_elem.set('tokenIDs', ' '.join('t_{}'.format(i) for i
+                                          in range(max(n - 2, 0), n + 1)))
+    return etree.tostring(root)
+
+
+def long_classes(data):
+    """Return `data` with the long forms of the CoNLL entity classes."""
+    for short, long in ((b'PER', b'PERSON'), (b'ORG', b'ORGANIZATION'),
+                        (b'LOC', b'LOCATION')):
+        data = data.replace(b'class="' + short + b'"',
+                            b'class="' + long + b'"')
+    return data
+
+
+class TestResolution(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.data = widen_references(tcf.serialize(
+                generate_corpus(sentences=100)))
+
+    def worker(self, data, **options):
+        worker = CooccurrenceWorker(**options)
+        worker.setup(tcf.TextCorpus(data))
+        return worker
+
+    def assertSameTokens(self, worker, old_test):
+        tokens = list(worker.corpus.tokens)
+        passed = [token.id for token in tokens if old_test(token)]
+        # The fixture has to exercise both outcomes and references.
+        self.assertTrue(0 < len(passed) < len(tokens))
+        self.assertTrue(any(not old_test(token, resolve=False)
+                            for token in tokens if old_test(token)))
+        self.assertEqual([token.id for token in tokens
+                          if worker.test_token(token)], passed)
+
+    def test_entity(self):
+        for data in (self.data, long_classes(self.data)):
+            worker = self.worker(data, nodes='entity')
+            self.assertSameTokens(worker, entity_lookup)
+
+    def test_actor(self):
+        # The old test hard-coded both forms of the CoNLL tags of actors.
+        actor_classes = ('PER', 'PERSON', 'ORG', 'ORGANIZATION')
+        for data in (self.data, long_classes(self.data)):
+            worker = self.worker(data, nodes='actor')
+            self.assertSameTokens(
+                    worker, partial(actor_lookup,
+                                    actor_classes=actor_classes))
+
+    def test_actor_class_map(self):
+        # Map the classes to custom canonical classes and select actors by
+        # them.
+        worker = self.worker(long_classes(self.data), nodes='actor',
+                             entity_classes=['PERSON:person',
+                                             'ORGANIZATION:group',
+                                             'LOCATION:place'],
+                             actors=['person', 'place'])
+        self.assertSameTokens(
+                worker, partial(actor_lookup,
+                                actor_classes=('PERSON', 'LOCATION')))
+        # Classes without a mapping are used as they are.
+        worker = self.worker(self.data, nodes='actor',
+                             entity_classes=['PER:person'],
+                             actors=['person', 'ORG'])
+        self.assertSameTokens(
+                worker, partial(actor_lookup, actor_classes=('PER', 'ORG')))
+
+    def test_postag(self):
+        postags = [ISOcat['properNoun']]
+        worker = self.worker(self.data)
+        names = sorted({token.text for token in worker.corpus.tokens
+                        if token.postag.is_a(postags[0])})
+        for stopwords in ([], names[:3]):
+            with self.subTest(stopwords=stopwords):
+                worker = self.worker(self.data, nodes='postag',
+                                     postag=['properNoun'],
+                                     stopwords=stopwords)
+                self.assertSameTokens(
+                        worker, partial(postag_lookup, postags=postags,
+                                         stopwords=stopwords))
+
+    def test_unresolved(self):
+        worker = self.worker(self.data)
+        for token in worker.corpus.tokens:
+            self.assertEqual(worker.test_token_entity(token, False),
+                             token.entity is not None)
+            self.assertEqual(
+                    worker.test_token_actor(token, False),
+                    actor_lookup(token, ('PER', 'ORG'), resolve=False))
+
+    def test_index(self):
+        corpus = tcf.TextCorpus(long_classes(self.data))
+        index = ResolutionIndex(corpus)
+        for token in corpus.tokens:
+            classes = set()
+            for reftoken in [token] + (list(token.reference.tokens)
+                                       if token.reference is not None
+                                       else []):
+                if reftoken.entity is not None:
+                    classes.add(reftoken.entity.class_)
+            expected = {{'PERSON': 'PER', 'ORGANIZATION': 'ORG',
+                         'LOCATION': 'LOC'}[class_] for class_ in classes}
+            self.assertEqual(index.classes.get(token.id, frozenset()),
+                             expected)
+
+    def test_parse_class_map(self):
+        self.assertEqual(parse_class_map(['PERSON:PER', '', 'a:b:c']),
+                         {'PERSON': 'PER', 'a': 'b:c'})
+        with self.assertRaises(ValueError):
+            parse_class_map(['PERSON'])
+        with self.assertRaises(SystemExit):
+            CooccurrenceWorker(entity_classes=['PERSON'])
+
+
+if __name__ == '__main__':
+    unittest.main()
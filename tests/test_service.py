@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the worker service, run against a service on a local port.
+
+"""
+
+import os
+import time
+import socket
+import asyncio
+import tempfile
+import threading
+import unittest
+
+from tcflib import tcf
+
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+from tcfnetworks.service import WorkerService, ServiceClient, ServiceError
+
+
+class ServiceTestCase(unittest.TestCase):
+    """Runs a :class:`WorkerService` in a background thread."""
+
+    options = {}
+
+    @classmethod
+    def setUpClass(cls):
+        cls.loop = asyncio.new_event_loop()
+        cls.thread = threading.Thread(target=cls.loop.run_forever,
+                                      daemon=True)
+        cls.thread.start()
+        cls.service = WorkerService(['cooccurrence'], processes=1,
+                                    **cls.options)
+        asyncio.run_coroutine_threadsafe(cls.service.start('localhost', 0),
+                                         cls.loop).result()
+        cls.client = ServiceClient(port=cls.service.port, timeout=60)
+
+    @classmethod
+    def tearDownClass(cls):
+        asyncio.run_coroutine_threadsafe(cls.service.stop(),
+                                         cls.loop).result()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+
+    def wait_idle(self, timeout=60):
+        deadline = time.monotonic() + timeout
+        while self.client.metrics()['pending']:
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.05)
+
+
+class TestRequests(ServiceTestCase):
+
+    def setUp(self):
+        self.corpus = generate_corpus(sentences=10)
+
+    def assert_graph(self, output):
+        corpus = tcf.TextCorpus(output)
+        graph = corpus.tree.find('.//' + tcf.P_TEXT + 'graph')
+        self.assertIsNotNone(graph)
+        self.assertTrue(len(graph.find(tcf.P_TEXT + 'nodes')))
+
+    def test_request(self):
+        self.assert_graph(self.client.run('cooccurrence', self.corpus,
+                                          window=2))
+
+    def test_invalid_option(self):
+        for options in ({'method': 'bogus'},
+                        {'stopwords_preset': 'bogus'},
+                        {'window': 'two'}):
+            with self.assertRaises(ServiceError) as context:
+                self.client.run('cooccurrence', self.corpus, **options)
+            self.assertEqual(context.exception.status, 400)
+        # The service still answers.
+        self.assert_graph(self.client.run('cooccurrence', self.corpus))
+        self.assertEqual(self.client.metrics()['pending'], 0)
+
+    def test_path_options(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'out')
+            for options in ({'metrics': path}, {'profile': path},
+                            {'cache': path}, {'cache_size': 1},
+                            {'sweep': 'window=2,metrics=' + path}):
+                with self.assertRaises(ServiceError) as context:
+                    self.client.run('cooccurrence', self.corpus, **options)
+                self.assertEqual(context.exception.status, 400)
+            self.assertEqual(os.listdir(directory), [])
+
+    def send(self, request):
+        with socket.create_connection(('localhost', self.service.port),
+                                      timeout=60) as connection:
+            connection.sendall(request)
+            return connection.makefile('rb').readline()
+
+    def test_content_length(self):
+        for length in (b'abc', b'-1'):
+            status = self.send(b'POST /cooccurrence HTTP/1.1\r\n'
+                               b'Content-Length: ' + length + b'\r\n\r\n')
+            self.assertEqual(status.split()[1], b'400')
+
+    def test_unknown_worker(self):
+        with self.assertRaises(ServiceError) as context:
+            self.client.run('bogus', self.corpus)
+        self.assertEqual(context.exception.status, 404)
+
+
+class TestTimeout(ServiceTestCase):
+
+    options = {'queue_size': 1, 'timeout': 0.2}
+
+    def test_timeout_keeps_slot(self):
+        # Building this graph takes a few seconds.
+        corpus = generate_corpus(sentences=300)
+        with self.assertRaises(ServiceError) as context:
+            self.client.run('cooccurrence', corpus)
+        self.assertEqual(context.exception.status, 504)
+        # The job still occupies the only process, so further requests are
+        # rejected until it is done.
+        with self.assertRaises(ServiceError) as context:
+            self.client.run('cooccurrence', corpus)
+        self.assertEqual(context.exception.status, 503)
+        metrics = self.client.metrics()
+        self.assertEqual(metrics['pending'], 1)
+        self.assertEqual(metrics['workers']['cooccurrence']['timeouts'], 1)
+        self.assertEqual(metrics['workers']['cooccurrence']['rejected'], 1)
+        self.wait_idle()
+
+
+if __name__ == '__main__':
+    unittest.main()
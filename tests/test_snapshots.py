@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the snapshots of cooccurrence graphs over slices of the corpus.
+
+"""
+
+import unittest
+from bisect import bisect_right
+from collections import Counter
+
+from lxml import etree
+from tcflib import tcf
+
+from tcfnetworks.annotators.cooccurrence import CooccurrenceWorker
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+
+
+def find(elem, tag):
+    return elem.find('.//' + tcf.P_TEXT + tag)
+
+
+def replay(snapshots_elem):
+    """
+    Apply the deltas of all snapshots in turn.
+
+    :returns:
+        - A list of dicts mapping `(source, target)` node IDs to edge
+          weights, one per snapshot.
+
+    """
+    states = []
+    state = {}
+    for snapshot_elem in snapshots_elem:
+        state = state.copy()
+        for delta_elem in snapshot_elem:
+            key = delta_elem.get('source'), delta_elem.get('target')
+            tag = etree.QName(delta_elem).localname
+            if tag == 'added':
+                assert key not in state, key
+                state[key] = int(delta_elem.get('weight'))
+            elif tag == 'reweighted':
+                assert state[key] != int(delta_elem.get('weight')), key
+                state[key] = int(delta_elem.get('weight'))
+            elif tag == 'removed':
+                assert 'weight' not in delta_elem.attrib, key
+                del state[key]
+            else:
+                raise AssertionError(tag)
+        states.append(state)
+    return states
+
+
+class TestSnapshots(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = generate_corpus(sentences=60)
+
+    def run_worker(self, **options):
+        root = etree.fromstring(tcf.serialize(
+                CooccurrenceWorker(**options).run(self.corpus)))
+        graph_elem = find(root, 'graph')
+        snapshots_elem = find(graph_elem, 'snapshots')
+        self.assertEqual(snapshots_elem.get('cumulative'),
+                         str(options.get('cumulative', False)).lower())
+        return root, graph_elem, snapshots_elem
+
+    def slice_weights(self, root, graph_elem, snapshots_elem):
+        """
+        Count the token pairs of the graph layer per slice.
+
+        A pair belongs to the slice of its later token, which is the last
+        slice that starts before it.
+
+        """
+        positions = {token_elem.get('ID'): i for i, token_elem
+                     in enumerate(root.iter(tcf.P_TEXT + 'token'))}
+        starts = [positions[snapshot_elem.get('start')]
+                  for snapshot_elem in snapshots_elem]
+        slices = [Counter() for start in starts]
+        for edge_elem in graph_elem.iter(tcf.P_TEXT + 'edge'):
+            key = edge_elem.get('source'), edge_elem.get('target')
+            for token_edge in edge_elem:
+                later = max(positions[token_edge.get('source')],
+                            positions[token_edge.get('target')])
+                i = max(bisect_right(starts, later) - 1, 0)
+                slices[i][key] += int(token_edge.get('weight'))
+        return slices
+
+    def final_weights(self, graph_elem):
+        return {(edge_elem.get('source'), edge_elem.get('target')):
+                int(edge_elem.get('weight'))
+                for edge_elem in graph_elem.iter(tcf.P_TEXT + 'edge')}
+
+    def check(self, **options):
+        root, graph_elem, snapshots_elem = self.run_worker(**options)
+        self.assertGreater(len(snapshots_elem), 2)
+        states = replay(snapshots_elem)
+        slices = self.slice_weights(root, graph_elem, snapshots_elem)
+        final = self.final_weights(graph_elem)
+        self.assertEqual(sum(slices, Counter()), final)
+        if options.get('cumulative'):
+            # Each snapshot holds all slices up to it, the last one is the
+            # final graph.
+            for i, state in enumerate(states):
+                self.assertEqual(state, sum(slices[:i + 1], Counter()))
+            self.assertEqual(states[-1], final)
+            self.assertFalse(snapshots_elem.findall(
+                    './/' + tcf.P_TEXT + 'removed'))
+        else:
+            # Each snapshot holds its slice only, together they make up the
+            # final graph.
+            self.assertEqual(states, [dict(weights) for weights in slices])
+            self.assertEqual(sum(map(Counter, states), Counter()), final)
+
+    def test_paragraphs(self):
+        for cumulative in (False, True):
+            with self.subTest(cumulative=cumulative):
+                self.check(slices='paragraph', cumulative=cumulative)
+
+    def test_sentences(self):
+        for cumulative in (False, True):
+            with self.subTest(cumulative=cumulative):
+                self.check(slices='sentence', method='sentence',
+                           cumulative=cumulative)
+
+    def test_unique(self):
+        for cumulative in (False, True):
+            with self.subTest(cumulative=cumulative):
+                self.check(slices='paragraph', window=[2], unique=True,
+                           cumulative=cumulative)
+
+    def test_deltas(self):
+        # Non-cumulative snapshots remove edges of earlier slices that do
+        # not recur, and cumulative ones reweight recurring edges.
+        _, _, snapshots_elem = self.run_worker(slices='paragraph')
+        self.assertTrue(snapshots_elem.findall('.//' + tcf.P_TEXT + 'removed'))
+        _, _, snapshots_elem = self.run_worker(slices='paragraph',
+                                               cumulative=True)
+        self.assertTrue(snapshots_elem.findall(
+                './/' + tcf.P_TEXT + 'reweighted'))
+
+    def test_no_slices(self):
+        # Without spans of the type, all edges are in a single snapshot.
+        for cumulative in (False, True):
+            with self.subTest(cumulative=cumulative):
+                _, graph_elem, snapshots_elem = self.run_worker(
+                        slices='nospans', cumulative=cumulative)
+                snapshot_elem, = snapshots_elem
+                self.assertNotIn('start', snapshot_elem.attrib)
+                self.assertEqual(replay(snapshots_elem),
+                                 [self.final_weights(graph_elem)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for building several graphs in one run.
+
+"""
+
+import unittest
+
+from tcflib import tcf
+
+from tcfnetworks.annotators.cooccurrence import CooccurrenceWorker
+from tcfnetworks.annotators.dependency import DependencyWorker
+from tcfnetworks.benchmarks.synthetic import generate_corpus
+from tcfnetworks.exporters.d3_json import JSONWorker
+from tcfnetworks.exporters.graphml import GraphMLWorker
+
+
+def graph_layers(corpus):
+    """Return the graph layers of `corpus` by their `config`."""
+    return {graph_elem.get('config'): graph_elem for graph_elem
+            in corpus.tree.iter(tcf.P_TEXT + 'graph')}
+
+
+def describe(graph_elem):
+    """
+    Return the nodes and edges of a graph layer in a canonical order.
+
+    The order of nodes and of the token pairs of edges is not fixed for
+    all methods, so nodes and edges are identified by their texts.
+
+    """
+    names = {}
+    nodes = []
+    for node_elem in graph_elem.iter(tcf.P_TEXT + 'node'):
+        names[node_elem.get('ID')] = node_elem.text
+        nodes.append((node_elem.text, node_elem.get('count'),
+                      sorted(node_elem.get('tokenIDs').split())))
+    edges = []
+    for edge_elem in graph_elem.iter(tcf.P_TEXT + 'edge'):
+        pairs = sorted(sorted((elem.get('source'), elem.get('target')))
+                       for elem in edge_elem)
+        edges.append((sorted((names[edge_elem.get('source')],
+                              names[edge_elem.get('target')])),
+                      edge_elem.get('weight'), pairs))
+    return graph_elem.get('weight'), sorted(nodes), sorted(edges)
+
+
+class TestSweep(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.corpus = generate_corpus(sentences=30)
+
+    def check_sweep(self, worker_class, configurations, **options):
+        sweep = worker_class(sweep=[config for config, _ in configurations],
+                             **options).run(self.corpus)
+        layers = graph_layers(sweep)
+        self.assertEqual(list(layers),
+                         [config for config, _ in configurations])
+        for config, config_options in configurations:
+            with self.subTest(config=config):
+                single = worker_class(**dict(options, **config_options)).run(
+                        self.corpus)
+                single_layer, = graph_layers(single).values()
+                self.assertEqual(describe(layers[config]),
+                                 describe(single_layer))
+
+    def test_cooccurrence(self):
+        self.check_sweep(CooccurrenceWorker, [
+            ('window=2', {'window': [2]}),
+            ('window=2,window=5', {'window': [2, 5]}),
+            ('method=sentence', {'method': 'sentence'}),
+            ('window=2,unique=true', {'window': [2], 'unique': True}),
+            ('nodes=actor', {'nodes': 'actor', 'window': [2]}),
+        ], window=[2])
+
+    def test_dependency(self):
+        self.check_sweep(DependencyWorker, [
+            ('distance=1', {'distance': 1}),
+            ('distance=2', {'distance': 2}),
+            ('edges=semantic', {'edges': 'semantic'}),
+            ('nodes=semantic,edges=verbs_nouns',
+             {'nodes': 'semantic', 'edges': 'verbs_nouns'}),
+        ])
+
+    def test_invalid_configuration(self):
+        for config in ('window', 'windw=2', 'sweep=window=2',
+                       'metrics=out.json', 'method=bogus'):
+            with self.subTest(config=config):
+                with self.assertRaises(SystemExit):
+                    CooccurrenceWorker(sweep=[config])
+
+    def test_exporters_select_layer(self):
+        sweep = tcf.serialize(CooccurrenceWorker(
+                sweep=['window=2', 'window=5']).run(self.corpus))
+        for config, window in (('window=2', 2), ('window=5', 5)):
+            single = tcf.serialize(CooccurrenceWorker(window=[window]).run(
+                    self.corpus))
+            for exporter_class in (GraphMLWorker, JSONWorker):
+                with self.subTest(config=config,
+                                  exporter=exporter_class.__name__):
+                    self.assertEqual(
+                            tcf.serialize(exporter_class(graph=config).run(
+                                    sweep)),
+                            tcf.serialize(exporter_class().run(single)))
+        # Without a selection, the first graph layer is exported.
+        self.assertEqual(tcf.serialize(GraphMLWorker().run(sweep)),
+                         tcf.serialize(GraphMLWorker(graph='window=2').run(
+                                 sweep)))
+        with self.assertRaises(SystemExit):
+            GraphMLWorker(graph='window=3').run(sweep)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2013 Frederik Elwert <frederik.elwert@web.de>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as
+# published by the Free Software Foundation, either version 3 of the
+# License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Tests for the graph utilities.
+
+"""
+
+import random
+import unittest
+
+from tcfnetworks.utils import encode_token_runs, decode_token_runs
+
+
+class TestTokenRuns(unittest.TestCase):
+
+    examples = [
+        ([], ''),
+        ([0], '0'),
+        ([0, 1, 2], '0+2'),
+        ([5], '5'),
+        ([3, 4, 5, 9, 12, 13], '3+2 3 2+1'),
+        ([0, 2, 4], '0 1 1'),
+        ([1, 2, 10, 11, 12], '1+1 7+2'),
+    ]
+
+    def test_encode(self):
+        for positions, runs in self.examples:
+            with self.subTest(positions=positions):
+                self.assertEqual(encode_token_runs(positions), runs)
+
+    def test_decode(self):
+        for positions, runs in self.examples:
+            with self.subTest(runs=runs):
+                self.assertEqual(decode_token_runs(runs), positions)
+
+    def test_round_trip(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            n = rng.randrange(1, 500)
+            positions = sorted(rng.sample(range(n), rng.randrange(n + 1)))
+            self.assertEqual(
+                    decode_token_runs(encode_token_runs(positions)),
+                    positions)
+
+    def test_generator(self):
+        self.assertEqual(encode_token_runs(iter(range(2, 6))), '2+3')
+
+
+if __name__ == '__main__':
+    unittest.main()